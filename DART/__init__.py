@@ -1,6 +1,35 @@
+from importlib import import_module
+
 from .parameters import parameters as parameters
-from .attribute_configuration import *
-from .comparison import *
-from .hypervector_sets import *
-from .dataset import *
-from .utilities import *
+
+# the public names of each module; modules are only imported once one of their names is first accessed,
+# so that, e.g., configurations and comparisons can be used without importing torch
+_exports = {
+    "attribute_configuration": ["BaseConfiguration", "CategoricalConfiguration", "NumericConfiguration", "AttributeGroup"],
+    "basis_store": ["BasisStore"],
+    "bitmap_index": ["BitmapIndex"],
+    "comparison": ["Comparison"],
+    "contingency_cube": ["ContingencyCube", "CountAccumulator"],
+    "profiling": ["CompareStats"],
+    "hypervector_sets": ["HypervectorSet", "CategoricalHypervectorSet", "NumericHypervectorSet"],
+    "dataset": ["Dataset"],
+    "writers": ["ResultWriter", "JSONLWriter", "CSVWriter", "ParquetWriter", "open_result_writer"],
+    "utilities": ["read_files_to_dataframe", "read_files_in_chunks", "isNumeric"],
+}
+_modules = {name: module for (module, names) in _exports.items() for name in names}
+
+__all__ = ["parameters", *_modules]
+
+
+def __getattr__(name:str):
+    if name in _exports:
+        return import_module(f".{name}", __name__)
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{_modules[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals(), *_modules, *_exports])
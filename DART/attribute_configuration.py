@@ -7,15 +7,37 @@ __all__ = [
 ]
 
 from collections.abc import Iterable
+from copy import deepcopy
+from functools import wraps
 from numbers import Number
-import numpy as np
-import pandas as pd 
-from pandas.api.types import is_numeric_dtype
 import pprint
 from typing import Literal
 
 from .utilities import isNumeric
 from .parameters import parameters
+
+# numpy and pandas are imported where they are used, so that configurations can be created and imported quickly
+
+
+def _cached_property(*parameter_keys):
+    """
+    Creates a property whose value is computed once and then reused until it is invalidated, either by a
+    configuration setter calling :meth:`BaseConfiguration._clear_cache` or by a change to any of the 
+    global parameters listed in parameter_keys.
+    """
+    def decorator(method):
+        @wraps(method)
+        def getter(self):
+            state = [parameters[key] for key in parameter_keys]
+            if method.__name__ in self._cache:
+                cached_state, value = self._cache[method.__name__]
+                if cached_state == state:
+                    return value
+            value = method(self)
+            self._cache[method.__name__] = (deepcopy(state), value)
+            return value
+        return property(getter)
+    return decorator
    
 
 class BaseConfiguration():
@@ -35,6 +57,7 @@ class BaseConfiguration():
                  source:str, 
                  include:bool=True,
                  ):
+        self._clear_cache()
         self.source = source
         self.name = None # TODO
         self.include = include
@@ -52,6 +75,10 @@ class BaseConfiguration():
         del config["_type"]
         return cls.subclasses[_type](**config)
     
+    def _clear_cache(self):
+        """ Discards all memoized derived properties; called whenever a property they depend on is set. """
+        self._cache = {}
+
     @property
     def is_valid(self):
         """ Whether the current attribute configuration is valid (validity depends on attribute type). """
@@ -170,8 +197,9 @@ class CategoricalConfiguration(BaseConfiguration, _type="categorical"):
             raise Exception(f"Attribute values must be iterable, received type \"{type(value)}\"")
         value = sorted(list(set([str(v) for v in value])))
         self._values = value
+        self._clear_cache()
 
-    @property
+    @_cached_property()
     def groups(self): # NOTE: this logic calls at the getter to support preserving the original provided group list
         """ Indicates which values are considered equivalent or unique. """
         assigned = set([str(y) for x in self._groups.values() for y in x])
@@ -184,11 +212,9 @@ class CategoricalConfiguration(BaseConfiguration, _type="categorical"):
         not_specified = accounted.difference(assigned)
         groups = {**self._groups}
         if self.ungrouped_behavior == 'single': # put all ungrouped into a single "unassigned" group
-            if "unassigned" not in groups:
-                groups["unassigned"] = []
-            groups["unassigned"] += list(not_specified)
+            groups["unassigned"] = [*groups.get("unassigned", []), *sorted(not_specified)]
         elif self.ungrouped_behavior == 'individual': # put each value into its own group
-            for val in not_specified:
+            for val in sorted(not_specified): # sorted so that the order of the groups (and thus their codes/hypervectors) is reproducible
                 assert val not in groups.keys() # TODO: improve error handling
                 groups[val] = [val]
         else:
@@ -200,6 +226,52 @@ class CategoricalConfiguration(BaseConfiguration, _type="categorical"):
         if not isinstance(value, dict):
             raise Exception(f"The value of groups must be dict not \"{type(value)}\"")
         self._groups = {str(key):[str(v) for v in vals] for (key,vals) in value.items()}
+        self._clear_cache()
+    
+    @property
+    def ungrouped_behavior(self):
+        """ How values not specified in groups are handled. """
+        return self._ungrouped_behavior
+    
+    @ungrouped_behavior.setter
+    def ungrouped_behavior(self, value):
+        self._ungrouped_behavior = value
+        self._clear_cache()
+    
+    @_cached_property()
+    def labels(self) -> list[str]:
+        """ The names of the groups; the code of a group is its position in this list. """
+        return [*self.groups]
+    
+    @_cached_property()
+    def _group_codes(self) -> dict[str, int]:
+        """ Maps each value to the code of its group. """
+        codes = {label:code for (code, label) in enumerate(self.labels)}
+        return {v:codes[k] for (k, values) in self.groups.items() for v in values}
+    
+    def group_values(self, values:Iterable, labels:bool=False) -> np.ndarray:
+        """
+        Groups all of the provided values in a single vectorized pass.
+
+        Parameters
+        ----------
+        values : Iterable
+            The values to group.
+        labels : bool, default = False
+            If True, returns the name of each value's group instead of the group's index in :attr:`labels`.
+        
+        Raises exception listing every value that is not an accepted value of the attribute.
+        """
+        import numpy as np
+        import pandas as pd
+        values = pd.Series(np.asarray(values)).astype(str)
+        codes = values.map(self._group_codes)
+        if (unknown := codes.isna()).any():
+            raise Exception(f"{unknown.sum()} provided values are not accepted values of the attribute {self.name}: {set(values[unknown])}")
+        codes = codes.to_numpy(dtype=int)
+        if labels:
+            return np.array(self.labels, dtype=object)[codes]
+        return codes
         
     @property
     def __dict__(self):
@@ -294,6 +366,7 @@ class NumericConfiguration(BaseConfiguration, _type="numeric"):
             value = float(value)
         assert isinstance(value, Number)
         self._min = value
+        self._clear_cache()
     
     @property
     def max(self):
@@ -306,6 +379,7 @@ class NumericConfiguration(BaseConfiguration, _type="numeric"):
             value = float(value)
         assert isinstance(value, Number)
         self._max = value
+        self._clear_cache()
 
     @property
     def step(self):
@@ -319,8 +393,9 @@ class NumericConfiguration(BaseConfiguration, _type="numeric"):
         assert isinstance(value, Number)
         assert value != 0
         self._step = value
+        self._clear_cache()
 
-    @property
+    @_cached_property("numeric.ideal_bin_count")
     def bin(self):
         if self._bin == "none":
             value = abs(self.step)
@@ -345,15 +420,14 @@ class NumericConfiguration(BaseConfiguration, _type="numeric"):
     
     @bin.setter
     def bin(self, value): # TODO: improve error handling
-        if value in ["auto", "none"]:
-            self._bin = value
-            return
-        if isinstance(value, str):
-            assert isNumeric(value)
-        assert isinstance(value, Number)
+        if value not in ["auto", "none"]:
+            if isinstance(value, str):
+                assert isNumeric(value)
+            assert isinstance(value, Number)
         self._bin = value
+        self._clear_cache()
         
-    @property
+    @_cached_property()
     def dtype(self):
         if self._dtype == "auto":
             numbers = [self._min, self._max, self._step]
@@ -376,8 +450,9 @@ class NumericConfiguration(BaseConfiguration, _type="numeric"):
             value = "none"
         assert value in ["auto", "none", "float", "int"]
         self._dtype = value
+        self._clear_cache()
 
-    @property
+    @_cached_property("numeric.ideal_bin_count")
     def bins(self):
         B = self.bin
         n_bins = round((self.max-self.min)/B)
@@ -385,17 +460,55 @@ class NumericConfiguration(BaseConfiguration, _type="numeric"):
         bin_ranges[-1][-1] = max(bin_ranges[-1][-1],self.max + self.step)
         return { f"[{L}, {U})":(L,U) for [L,U] in bin_ranges}
     
+    @_cached_property("numeric.ideal_bin_count")
+    def labels(self) -> list[str]:
+        """ The names of the bins; the code of a bin is its position in this list. """
+        return [*self.bins]
+    
+    @_cached_property("numeric.ideal_bin_count")
+    def edges(self) -> np.ndarray:
+        """ 
+        The edges of the bins in ascending order; bin i covers [edges[i], edges[i+1]).
+        Has one more element than :attr:`bins`.
+        """
+        import numpy as np
+        bin_ranges = [*self.bins.values()]
+        return np.array([L for (L,_) in bin_ranges] + [bin_ranges[-1][-1]], dtype=float)
+    
     def bin_value(self, value) -> str:
         """ 
         Returns the string representing the correct bin for the provided value. 
         Raises exception if the value is outside of the attribute's supported range.
         """
-        if value < self.min or value > self.max:
-            raise Exception(f"The provided value {value} is outside of the supported range for the attribute {self.name} ([{self.min}, {self.max}])")
-        for (B, (lower,upper)) in self.bins.items():
-            if value >= lower and value < upper:
-                return B
+        return self.bin_values([value], labels=True)[0]
+    
+    def bin_values(self, values:Iterable, labels:bool=False) -> np.ndarray:
+        """
+        Bins all of the provided values in a single vectorized pass.
+
+        Parameters
+        ----------
+        values : Iterable
+            The values to bin.
+        labels : bool, default = False
+            If True, returns the string representing each value's bin instead of the bin's index in :attr:`bins`.
         
+        Raises exception listing every value outside of the attribute's supported range.
+        """
+        import numpy as np
+        values = np.asarray(values)
+        if values.dtype.kind not in "iuf":
+            values = values.astype(float)
+        out_of_range = ~((values >= self.min) & (values <= self.max)) # NaN values are also out of range
+        if out_of_range.any():
+            invalid = np.unique(values[out_of_range]).tolist()
+            if len(invalid) == 1:
+                raise Exception(f"The provided value {invalid[0]} is outside of the supported range for the attribute {self.name} ([{self.min}, {self.max}])")
+            raise Exception(f"{out_of_range.sum()} provided values are outside of the supported range for the attribute {self.name} ([{self.min}, {self.max}]): {invalid}")
+        codes = np.searchsorted(self.edges, values, side="right") - 1
+        if labels:
+            return np.array(self.labels, dtype=object)[codes]
+        return codes
 
     def _set_type(self, value):
         if self.dtype == "int":
@@ -465,6 +578,22 @@ class AttributeGroup():
         assert name in self.attributes # TODO: improve error handling
         self._attributes[name] = new_configuration
     
+    def codes(self, data:pd.DataFrame, attributes:list[str]=None) -> dict[str, np.ndarray]:
+        """ 
+        Bins/groups the values of each attribute in data (all attributes if attributes is None).
+        Returns the integer code of each sample's value, which indexes the attribute configuration's labels.
+        """
+        codes = {}
+        for att in (self.attributes if attributes is None else attributes):
+            config = self[att]
+            if (t := config.type) == "categorical":
+                codes[att] = config.group_values(data[att])
+            elif t == "numeric":
+                codes[att] = config.bin_values(data[att])
+            else:
+                raise Exception(f"Unsupported attribute type \"{t}\"")
+        return codes
+    
     def __iter__(self):
         yield from self._attributes.values()
     
@@ -489,6 +618,8 @@ def _get_default_configuration(
         exclude_columns:list=[],
         drop_missing:bool=True, # NOTE: currently things downstream only work if missing is dropped!
     ) -> list[BaseConfiguration]:
+    import pandas as pd
+    from pandas.api.types import is_numeric_dtype
     if isinstance(data, pd.DataFrame):
         columns = set([*data.columns]).difference(set(exclude_columns))
         if include_columns is not None:
@@ -0,0 +1,65 @@
+from __future__ import annotations
+__all__ = [
+    "BasisStore",
+]
+
+from collections.abc import Callable
+import hashlib
+import json
+import numpy as np
+import os
+from pathlib import Path
+import tempfile
+
+
+class BasisStore():
+    """
+    A content-addressed directory of hypervector sets saved as .npy files.
+    Each set is stored under a digest of the description of everything that determines it (e.g., the attribute, its keys, and the hypervector parameters),
+    so it is generated once and then shared by every :class:`Dataset`, process, and run that uses the same store.
+    Sets are opened as copy-on-write memory-mapped arrays, so processes reading the same set share its pages rather than holding a copy each.
+
+    Parameters
+    ----------
+    directory : str or Path
+        The directory in which the sets are stored; created if it does not exist.
+    """
+    def __init__(self, directory:str|Path):
+        self._directory = Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def digest(self, description:dict) -> str:
+        """ The content address of the set with the provided description. """
+        return hashlib.sha256(json.dumps(description, sort_keys=True, default=str).encode()).hexdigest()
+
+    def path(self, description:dict) -> Path:
+        return self._directory / f"{self.digest(description)}.npy"
+
+    def __contains__(self, description:dict) -> bool:
+        return self.path(description).exists()
+
+    def load(self, description:dict) -> np.ndarray:
+        """ Memory maps the stored set with the provided description. """
+        return np.load(self.path(description), mmap_mode="c")
+
+    def save(self, description:dict, values:np.ndarray):
+        """
+        Stores a set under its description (alongside a .json file of the description itself).
+        Files are written to a temporary file and then renamed, so concurrent writers of the same set never expose a partial file.
+        """
+        path = self.path(description)
+        for (suffix, write) in [(".json", lambda file: file.write(json.dumps(description, sort_keys=True, default=str, indent=1).encode())),
+                                (".npy", lambda file: np.save(file, np.asarray(values)))]:
+            with tempfile.NamedTemporaryFile(dir=self._directory, suffix=".tmp", delete=False) as file:
+                write(file)
+            os.replace(file.name, path.with_suffix(suffix))
+
+    def get(self, description:dict, generate:Callable[[], np.ndarray]) -> np.ndarray:
+        """ Memory maps the set with the provided description, first generating and storing it if it is not yet in the store. """
+        if description not in self:
+            self.save(description, generate())
+        return self.load(description)
@@ -0,0 +1,131 @@
+from __future__ import annotations
+__all__ = [
+    "BitmapIndex",
+]
+
+import numpy as np
+
+
+class BitmapIndex():
+    """
+    Packed bitsets marking which rows take each (attribute, value) pair of an integer coded sample table.
+    Criteria are resolved with bitwise AND/OR operations on the bitsets rather than by filtering the table.
+    Rows can be appended without rebuilding the bitsets (storage grows geometrically).
+
+    A bitset takes a bit per row for every value of the attribute, so attributes with more than max_bitmap_values values
+    (e.g., finely binned numeric attributes) are instead indexed by the sorted positions of the rows taking each value,
+    which take a fixed amount of memory per row however many values the attribute has.
+
+    Parameters
+    ----------
+    codes : dict[str, np.ndarray]
+        The integer code of each row's value, for each attribute.
+    n_values : dict[str, int]
+        The number of distinct codes each attribute may take.
+    """
+    max_bitmap_values = 64
+
+    def __init__(self, codes:dict[str, np.ndarray], n_values:dict[str, int]):
+        self._n_rows = len(next(iter(codes.values()))) if len(codes) > 0 else 0
+        self._all = self._pack(np.ones(self._n_rows, dtype=bool))
+        self._attributes = [*codes]
+        self._n_values = {**n_values}
+        self._bitmaps = {} # attribute -> bitsets of shape (n_values, words), for attributes with at most max_bitmap_values values
+        self._codes = {} # attribute -> codes of every row, for the other attributes
+        self._sorted = {} # attribute -> (positions of the rows sorted by code, offset of each code's positions), built as needed
+        position = np.arange(self._n_rows)
+        for att, values in codes.items():
+            values = np.asarray(values)
+            if n_values[att] <= self.max_bitmap_values:
+                self._bitmaps[att] = np.zeros((n_values[att], len(self._all)), dtype=np.uint64)
+                self._set_bits(self._bitmaps[att], values, position)
+            else:
+                self._codes[att] = values
+
+    def append(self, codes:dict[str, np.ndarray]):
+        """ Appends rows (the integer code of each row's value, for each attribute) by setting only their bits. """
+        n_new = len(next(iter(codes.values())))
+        positions = np.arange(self._n_rows, self._n_rows + n_new)
+        self._n_rows += n_new
+        if (n_words := -(-self._n_rows // 64)) > len(self._all):
+            capacity = max(n_words, 2 * len(self._all))
+            self._all = np.pad(self._all, (0, capacity - len(self._all)))
+            self._bitmaps = {att: np.pad(bitmaps, ((0, 0), (0, capacity - bitmaps.shape[1]))) for (att, bitmaps) in self._bitmaps.items()}
+        byte, bit = self._bits(positions)
+        np.bitwise_or.at(self._all.view(np.uint8), byte, bit)
+        for att, bitmaps in self._bitmaps.items():
+            self._set_bits(bitmaps, np.asarray(codes[att]), positions)
+        for att in self._codes:
+            self._codes[att] = np.concatenate([self._codes[att], np.asarray(codes[att], dtype=self._codes[att].dtype)])
+            self._sorted.pop(att, None)
+
+    @staticmethod
+    def _bits(positions:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """ The byte and bit (within the byte) of each row position; bits are packed most significant first within each byte (see np.packbits). """
+        return positions // 8, np.left_shift(1, 7 - positions % 8).astype(np.uint8)
+
+    def _set_bits(self, bitmaps:np.ndarray, values:np.ndarray, positions:np.ndarray):
+        """ Sets the bit of each row position in the bitset of its value (in a single pass over the rows). """
+        byte, bit = self._bits(positions)
+        np.bitwise_or.at(bitmaps.view(np.uint8), (np.asarray(values, dtype=np.int64), byte), bit)
+
+    def _value_positions(self, att:str, codes:list[int]) -> np.ndarray:
+        """ The positions of the rows taking any of the codes, for an attribute indexed by positions rather than bitsets. """
+        if att not in self._sorted:
+            values = self._codes[att]
+            offsets = np.zeros(self._n_values[att] + 1, dtype=np.int64)
+            np.cumsum(np.bincount(values, minlength=self._n_values[att]), out=offsets[1:])
+            self._sorted[att] = (np.argsort(values, kind="stable"), offsets)
+        order, offsets = self._sorted[att]
+        return np.concatenate([order[offsets[code]:offsets[code + 1]] for code in codes])
+
+    def _pack(self, mask:np.ndarray) -> np.ndarray:
+        """ Packs a boolean row mask into 64-bit words. """
+        packed = np.packbits(mask)
+        packed = np.pad(packed, (0, -len(packed) % 8))
+        return packed.view(np.uint64)
+
+    def _unpack(self, bitmap:np.ndarray) -> np.ndarray:
+        """ Unpacks 64-bit words into a boolean row mask. """
+        return np.unpackbits(bitmap.view(np.uint8), count=self._n_rows).astype(bool)
+
+    @property
+    def _n_words(self) -> int:
+        """ The number of words in use (storage may have extra capacity for appended rows). """
+        return -(-self._n_rows // 64)
+
+    def __len__(self):
+        return self._n_rows
+
+    @property
+    def attributes(self) -> list[str]:
+        return [*self._attributes]
+
+    def bitmap(self, criteria:dict[str, list[int]]) -> np.ndarray:
+        """
+        The packed bitset of the rows meeting all criteria.
+        Criteria map each attribute to the list of codes it may take (combined with OR); attributes are combined with AND.
+        """
+        result = self._all[:self._n_words].copy()
+        for att, codes in criteria.items():
+            if len(codes) < 1:
+                return np.zeros_like(result)
+            if att in self._bitmaps:
+                result &= np.bitwise_or.reduce(self._bitmaps[att][codes, :self._n_words], axis=0)
+            else:
+                mask = np.zeros(self._n_rows, dtype=bool)
+                mask[self._value_positions(att, codes)] = True
+                result &= self._pack(mask)
+        return result
+
+    def mask(self, criteria:dict[str, list[int]]) -> np.ndarray:
+        """ Boolean mask of the rows meeting the criteria. """
+        return self._unpack(self.bitmap(criteria))
+
+    def positions(self, criteria:dict[str, list[int]]) -> np.ndarray:
+        """ Positions of the rows meeting the criteria, in ascending order. """
+        return np.flatnonzero(self.mask(criteria))
+
+    def count(self, criteria:dict[str, list[int]]) -> int:
+        """ Number of rows meeting the criteria. """
+        return int(np.unpackbits(self.bitmap(criteria).view(np.uint8)).sum(dtype=np.int64))
@@ -6,50 +6,93 @@ __all__ = [
 import pprint
 from typing import Literal
 
+from .profiling import CompareStats
+
 class Comparison():
     """
-    Helps organize complex comparison outputs. 
+    Helps organize complex comparison outputs.
     The actual comparison process is part of :class:`Dataset`.
 
+    Results are stored in columns rather than per subgroup: one entry per subgroup (its level, whether it had insufficient samples, and where its similarity values start)
+    and one entry per similarity value (its subgroup id, the id of the combination of attributes it is from, and its value).
+    :class:`ComparisonItem` objects are lightweight views of a single subgroup's entries.
+
     Parameters
     ----------
     criteria1, criteria2 : dict
         Criteria describing the two defined groups being compared.
     ignore_inherent : bool
         The ignore_inherent setting passed to :meth:`Dataset.compare`.
+    stats : :class:`CompareStats`, optional
+        The instrumentation of the comparison, if it was profiled.
     """
-    def __init__(self, criteria1:dict, criteria2:dict, ignore_inherent:bool):
+    def __init__(self, criteria1:dict, criteria2:dict, ignore_inherent:bool, stats:CompareStats=None):
         self._criteria1 = {**criteria1}
         self._criteria2 = {**criteria2}
         self._ignore_inherent = ignore_inherent
-        self._items = []
-    
+        self._stats = stats
+        self._subgroups = [] # the definition of each subgroup (by subgroup id)
+        self._combinations = [] # the attributes of each combination (by combination id)
+        self._combination_ids = {}
+        self._items = _Columns(level="int32", insufficient_samples="bool", start="int64")
+        self._results = _Columns(subgroup_id="int64", combination_id="int32", similarity="float64")
+
     @property
     def criteria(self) -> list[dict]:
         return [self._criteria1, self._criteria2]
-    
+
+    @property
+    def stats(self) -> CompareStats|None:
+        """ The timers and counters of the comparison (see :class:`CompareStats`); None unless :meth:`Dataset.compare` was run with profile = True or a callback. """
+        return self._stats
+
     @property
     def items(self) -> list:
-        return self._items
-    
+        return [ComparisonItem(self, index) for index in range(len(self))]
+
+    @property
+    def combinations(self) -> list[tuple]:
+        """ The combinations of similarity attributes, indexed by the combination ids of :meth:`to_pandas`. """
+        return [*self._combinations]
+
     def add(self, subgroup:dict, similarities:dict, insufficient_samples:bool=False): # adds a new ComparisonItem
-        self._items.append(ComparisonItem(self, subgroup, similarities, insufficient_samples))
-    
+        combination_ids = [self._combination_id(attributes) for attributes in similarities]
+        self._items.append(level=len(subgroup), insufficient_samples=insufficient_samples, start=len(self._results))
+        self._results.extend(subgroup_id=[len(self._subgroups)] * len(similarities), combination_id=combination_ids, similarity=[*similarities.values()])
+        self._subgroups.append(subgroup)
+
+    def _combination_id(self, attributes:tuple) -> int:
+        if attributes not in self._combination_ids:
+            self._combination_ids[attributes] = len(self._combinations)
+            self._combinations.append(attributes)
+        return self._combination_ids[attributes]
+
+    def _bounds(self, index:int) -> tuple[int, int]:
+        """ The range of the similarity values of the subgroup with the provided id. """
+        starts = self._items["start"]
+        return int(starts[index]), (int(starts[index+1]) if index + 1 < len(starts) else len(self._results))
+
     def __iter__(self):
         yield from self.items
-    
+
     def __len__(self):
-        return len(self.items)
-    
+        return len(self._subgroups)
+
     def __repr__(self) -> str:
         class_name = self.__class__.__name__
         indent = len(class_name) + 1
         repr = ('\n' + ' '*indent).join(pprint.pformat(dict(populations=self.criteria), indent=1, width=80 - indent).split("\n"))
         return f"{class_name}({repr})"
 
-    def __getitem__(self, index:int):
-        return self.items[index]
-    
+    def __getitem__(self, index:int|slice):
+        if isinstance(index, slice):
+            return [ComparisonItem(self, i) for i in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Comparison index out of range")
+        return ComparisonItem(self, index)
+
     def export(self, orient:Literal["minimal", "maximal", "tabular"]="minimal", include_empty:bool=False) -> dict|list:
         """
         Exports the comparison information to a dictionary or a list (depending on the value of orient).
@@ -57,16 +100,19 @@ class Comparison():
         Parameters
         ----------
         orient : {"minimal","maximal", "tabular"}
-            Format of how the information should be saved. 
+            Format of how the information should be saved.
             "minimal" avoids repeating information that applies to multiple :class:`ComparisonItem` objects.
             "maximal" repeats information, producing a more reader-friendly output.
             "tabular" similar to "maximal", but doesn't include :class:`Comparison`-wide information (such as the original two criteria) and formats lists into strings.
         include_empty : bool, default = False
             If False, :class:`ComparisonItem` objects with no similarity values will be excluded.
         """
-        items = [item.export(orient=orient) for item in self.items]
-        
         if orient == "minimal":
+            items = [{
+                "subgroup": subgroup,
+                "comparison_level": len(subgroup),
+                "similarities": similarities,
+            } for (subgroup, similarities) in zip(self._subgroups, self._similarities())]
             if not include_empty:
                 items = [item for item in items if len(item['similarities']) > 0]
             # avoid repeating information that applies to multiple similarity values
@@ -75,72 +121,171 @@ class Comparison():
                 "comparisons": items
             }
         elif orient in ["maximal", "tabular"]:
-            records = [x for item in items for x in item]
+            # each row's subgroup and attributes are formatted once per subgroup/combination rather than once per row
+            levels = self._items["level"].tolist()
+            rows = zip(self._results["subgroup_id"].tolist(), self._results["combination_id"].tolist(), self._results["similarity"].tolist())
+            if orient == "maximal":
+                records = [{
+                    "subgroups": [{**self._criteria1, **self._subgroups[i]}, {**self._criteria2, **self._subgroups[i]}],
+                    "similarity_from": list(self._combinations[c]),
+                    "comparison_level": levels[i],
+                    "similarity": similarity,
+                } for (i, c, similarity) in rows]
+            else:
+                subgroups, combinations = self._labels()
+                records = [{
+                    "subgroup": subgroups[i],
+                    "similarity_from": combinations[c],
+                    "comparison_level": levels[i],
+                    "similarity": similarity,
+                } for (i, c, similarity) in rows]
         else:
             raise Exception(f"Unrecognized value of \"orient\" (\"{orient}\"); must be one of: [\"minimal\", \"maximal\", \"tabular\"].")
         return records
 
-    
+    def _similarities(self) -> list[dict]:
+        """ The similarity values of every subgroup (see :attr:`ComparisonItem.similarities`). """
+        rows = [*zip([self._combinations[c] for c in self._results["combination_id"].tolist()], self._results["similarity"].tolist())]
+        bounds = [*self._items["start"].tolist(), len(self._results)]
+        return [dict(rows[start:end]) for (start, end) in zip(bounds[:-1], bounds[1:])]
+
+    def _labels(self) -> tuple[list[str], list[str]]:
+        """ The "tabular" strings of each subgroup and each combination of attributes. """
+        subgroups = ["; ".join([f"{attribute}: {value}" for (attribute, value) in subgroup.items()]) for subgroup in self._subgroups]
+        return subgroups, ["; ".join(attributes) for attributes in self._combinations]
+
+    def _columns(self, include_empty:bool) -> dict[str, np.ndarray]:
+        """ The numeric columns of :meth:`to_pandas` (views of the stored columns unless include_empty adds rows). """
+        import numpy as np
+        columns = {
+            "subgroup_id": self._results["subgroup_id"],
+            "combination_id": self._results["combination_id"],
+            "similarity": self._results["similarity"],
+        }
+        empty = np.flatnonzero(np.diff(np.append(self._items["start"], len(self._results))) == 0) # subgroups without similarity values
+        if include_empty and len(empty) > 0:
+            order = np.argsort(np.concatenate([columns["subgroup_id"], empty]), kind="stable")
+            fill = {"subgroup_id": empty, "combination_id": np.full(len(empty), -1), "similarity": np.full(len(empty), np.nan)}
+            columns = {name: np.concatenate([column, fill[name]]).astype(column.dtype)[order] for (name, column) in columns.items()}
+        columns["comparison_level"] = self._items["level"][columns["subgroup_id"]]
+        columns["insufficient_samples"] = self._items["insufficient_samples"][columns["subgroup_id"]]
+        return columns
+
+    def to_pandas(self, include_empty:bool=False):
+        """
+        Exports the similarity values to a pandas DataFrame with one row per value,
+        with the columns of the "tabular" orient of :meth:`export` (subgroup and similarity_from are categorical)
+        followed by the subgroup_id (see :meth:`__getitem__`), combination_id (see :attr:`combinations`), and insufficient_samples of each row.
+        The subgroup_id, combination_id, and similarity columns share the memory of the comparison rather than copying it.
+
+        Parameters
+        ----------
+        include_empty : bool, default = False
+            If True, subgroups with no similarity values are included as a single row with a combination_id of -1 and a missing similarity
+            (the columns are then copied).
+        """
+        import pandas as pd
+        columns = self._columns(include_empty)
+        subgroups, combinations = self._labels()
+        codes, categories = pd.factorize(pd.Series(subgroups, dtype=object))
+        return pd.DataFrame({
+            "subgroup": pd.Categorical.from_codes(codes[columns["subgroup_id"]], categories),
+            "similarity_from": pd.Categorical.from_codes(columns["combination_id"], combinations),
+            "comparison_level": columns["comparison_level"],
+            "similarity": columns["similarity"],
+            "subgroup_id": columns["subgroup_id"],
+            "combination_id": columns["combination_id"],
+            "insufficient_samples": columns["insufficient_samples"],
+        }, copy=False)
+
+    def to_arrow(self, include_empty:bool=False):
+        """
+        Exports the similarity values to a pyarrow Table with the columns of :meth:`to_pandas` (subgroup and similarity_from are dictionary encoded).
+        Requires pyarrow (the "columnar" extra).
+        """
+        import pyarrow as pa
+        columns = self._columns(include_empty)
+        subgroups, combinations = self._labels()
+        combination_ids = pa.array(columns["combination_id"], mask=columns["combination_id"] < 0)
+        return pa.table({
+            "subgroup": pa.DictionaryArray.from_arrays(pa.array(columns["subgroup_id"]), pa.array(subgroups, type=pa.string())),
+            "similarity_from": pa.DictionaryArray.from_arrays(combination_ids, pa.array(combinations, type=pa.string())),
+            "comparison_level": columns["comparison_level"],
+            "similarity": columns["similarity"],
+            "subgroup_id": columns["subgroup_id"],
+            "combination_id": columns["combination_id"],
+            "insufficient_samples": columns["insufficient_samples"],
+        })
+
+
 class ComparisonItem():
     """
     Holds the comparisons related to a specific intersectional subgroup.
-    Should be created via the :meth:`Comparison.add` method.
+    Items are views of the columns of their :class:`Comparison`, which creates them (see :meth:`Comparison.add`).
 
     Parameters
     ----------
     parent : :class:`Comparison`
         The :class:`Comparison` object that this item belongs to.
-    subgroup : dict
-        The intersectional subgroup that this item describes.
-    similarities : dict
-        The similarity values this object will store, in format {(similarity_attributes,) : similarity_value}.
-    insufficient_samples : bool, default = False
-        Flag passed if one or more of the gorups being compared had no samples and thus comparisons could not be made.
-
+    index : int
+        The id of the subgroup within the parent.
     """
-    def __init__(self, parent: Comparison, subgroup:dict, similarities:dict, insufficient_samples:bool=False):
+    __slots__ = ("_parent", "_index")
+
+    def __init__(self, parent: Comparison, index:int):
         self._parent = parent
-        self._subgroup = subgroup
-        self._similarities = similarities
-        self._insufficient_samples = insufficient_samples
-    
+        self._index = index
+
     @property
     def parent(self):
         return self._parent
-    
+
+    @property
+    def index(self) -> int:
+        return self._index
+
     @property
     def subgroup(self):
         """ The intersectional subgroup definition of this specific item. """
-        return self._subgroup
-    
+        return self.parent._subgroups[self._index]
+
     @property
     def subgroups(self):
-        """ 
-        The full description of the groups being compared, 
+        """
+        The full description of the groups being compared,
         a combintation of the two criteria items of the parent :class:`Comparison` and this object's intersectional subgroup.
         """
         return [
             {**self.parent._criteria1, **self.subgroup},
             {**self.parent._criteria2, **self.subgroup},
         ]
-    
+
     @property
-    def similarities(self):
-        return self._similarities
-    
+    def similarities(self) -> dict:
+        """ The similarity values of this item, in format {(similarity_attributes,) : similarity_value}. """
+        start, end = self.parent._bounds(self._index)
+        combinations = self.parent._combinations
+        results = self.parent._results
+        return {combinations[c]: similarity for (c, similarity) in zip(results["combination_id"][start:end].tolist(), results["similarity"][start:end].tolist())}
+
+    @property
+    def insufficient_samples(self) -> bool:
+        """ Whether one or more of the groups being compared had no samples and thus comparisons could not be made. """
+        return bool(self.parent._items["insufficient_samples"][self._index])
+
     @property
     def level(self):
         return len(self.subgroup)
-    
+
     def items(self):
         yield from self.similarities.items()
-    
-    def __repr__(self) -> str: 
+
+    def __repr__(self) -> str:
         class_name = self.__class__.__name__
         indent = len(class_name) + 1
         repr = ('\n' + ' '*indent).join(pprint.pformat(self.subgroup, indent=1, width=80 - indent).split("\n"))
         return f"{class_name}({repr})"
-    
+
     def export(self, orient:Literal["minimal","maximal", "tabular"]="minimal") -> dict|list:
         """
         Exports this item's content to a dictionary or list (depending on the value of orient).
@@ -148,7 +293,7 @@ class ComparisonItem():
         Parameters
         ----------
         orient : {"minimal", "maximal"}, default = "minimal"
-            Format of how the information should be saved. 
+            Format of how the information should be saved.
             "minimal" avoids repeating information that applies to multiple :class:`ComparisonItem` objects.
             "maximal" repeats information, producing a more reader-friendly output.
             "tabular" similar to "maximal", but doesn't include :class:`Comparison`-wide information (such as the original two criteria) and formats lists into strings.
@@ -180,4 +325,38 @@ class ComparisonItem():
         return records
 
 
-    
\ No newline at end of file
+class _Columns():
+    """ Named numpy columns of equal length to which rows are appended (storage grows geometrically). """
+    def __init__(self, **dtypes:np.dtype):
+        import numpy as np # imported here (and in the other methods that need it) so that importing the comparisons does not require numpy
+        self._arrays = {name: np.empty(16, dtype=dtype) for (name, dtype) in dtypes.items()}
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, name:str) -> np.ndarray:
+        """ A view of the column's values. """
+        return self._arrays[name][:self._length]
+
+    def _reserve(self, length:int):
+        capacity = len(next(iter(self._arrays.values())))
+        if length > capacity:
+            import numpy as np
+            capacity = max(length, 2 * capacity)
+            self._arrays = {name: np.resize(array, capacity) for (name, array) in self._arrays.items()}
+
+    def append(self, **values):
+        """ Appends a single row. """
+        self._reserve(self._length + 1)
+        for (name, value) in values.items():
+            self._arrays[name][self._length] = value
+        self._length += 1
+
+    def extend(self, **values):
+        """ Appends the rows of equal-length sequences of values. """
+        n = len(next(iter(values.values())))
+        self._reserve(self._length + n)
+        for (name, value) in values.items():
+            self._arrays[name][self._length:self._length + n] = value
+        self._length += n
@@ -0,0 +1,214 @@
+from __future__ import annotations
+__all__ = [
+    "ContingencyCube",
+    "CountAccumulator",
+]
+
+from collections import OrderedDict
+import numpy as np
+
+
+class ContingencyCube():
+    """
+    Joint counts of the attribute values of one or more populations.
+    The cube is built in a single pass over the samples and stored sparsely as the distinct
+    (population, attribute values) combinations that occur along with the number of samples sharing each.
+    The value counts of any subgroup are then derived by marginalizing the cube rather than by re-filtering the samples;
+    marginals are likewise kept as the combinations that occur, so their size is bounded by that of the cube rather than by the number of possible combinations.
+
+    Parameters
+    ----------
+    codes : dict[str, np.ndarray]
+        The integer code of each sample's value, for each attribute to include in the cube.
+    n_values : dict[str, int]
+        The number of distinct codes each attribute may take.
+    populations : list[np.ndarray]
+        The positions of the samples that belong to each population. Populations may overlap.
+    weights : np.ndarray, optional
+        The number of samples each row of codes represents; if None, each row is a single sample.
+    """
+    max_cached_marginals = 256
+
+    def __init__(self, codes:dict[str, np.ndarray], n_values:dict[str, int], populations:list[np.ndarray], weights:np.ndarray=None):
+        self._attributes = [*codes]
+        self._n_values = {att: n_values[att] for att in self._attributes}
+        self._n_populations = len(populations)
+        rows = np.concatenate([np.asarray(p, dtype=np.int64) for p in populations])
+        columns = [np.concatenate([np.full(len(p), i, dtype=np.int64) for (i, p) in enumerate(populations)])]
+        columns += [np.asarray(codes[att], dtype=np.int64)[rows] for att in self._attributes]
+        shape = (self._n_populations, *self._n_values.values())
+        self._combinations, self._counts = _distinct_rows(columns, shape, None if weights is None else np.asarray(weights)[rows])
+        self._marginals = OrderedDict()
+
+    @classmethod
+    def from_rows(cls, attributes:list[str], n_values:dict[str, int], n_populations:int, combinations:np.ndarray, counts:np.ndarray):
+        """
+        Constructs a cube directly from its distinct combinations (rows of the population followed by the code of each attribute)
+        and their counts, e.g., those of another cube (see :attr:`rows`).
+        """
+        self = cls.__new__(cls)
+        self._attributes = [*attributes]
+        self._n_values = {att: n_values[att] for att in self._attributes}
+        self._n_populations = n_populations
+        self._combinations, self._counts = combinations, counts
+        self._marginals = OrderedDict()
+        return self
+
+    @classmethod
+    def stack(cls, cubes:list[ContingencyCube]):
+        """ Combines cubes of the same attributes into a single cube whose populations are those of each cube in turn. """
+        combinations, offset = [], 0
+        for cube in cubes:
+            rows = cube._combinations.copy()
+            rows[:, 0] += offset
+            combinations.append(rows)
+            offset += cube.n_populations
+        return cls.from_rows(cubes[0].attributes, cubes[0]._n_values, offset, np.concatenate(combinations), np.concatenate([cube._counts for cube in cubes]))
+
+    @property
+    def rows(self) -> tuple[np.ndarray, np.ndarray]:
+        """ The distinct (population, attribute codes) combinations and their counts. """
+        return self._combinations, self._counts
+
+    @property
+    def attributes(self) -> list[str]:
+        return [*self._attributes]
+
+    @property
+    def n_populations(self) -> int:
+        return self._n_populations
+
+    def __len__(self):
+        """ The number of distinct (population, attribute values) combinations with at least one sample. """
+        return len(self._counts)
+
+    def marginal(self, attributes:tuple[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Counts of the combinations of values of the provided attributes that occur, summed over all other attributes.
+        Returned sparsely as the distinct combinations (rows of the code of each attribute, in the provided order, followed by the population)
+        in lexicographic order, and their counts.
+        """
+        attributes = tuple(attributes)
+        if attributes in self._marginals:
+            self._marginals.move_to_end(attributes)
+            return self._marginals[attributes][:2]
+        shape = (*[self._n_values[att] for att in attributes], self._n_populations)
+        columns = [self._combinations[:, self._attributes.index(att) + 1] for att in attributes] + [self._combinations[:, 0]]
+        combinations, counts = _distinct_rows(columns, shape, self._counts)
+        # the position of each row in the dense marginal (if it can be indexed with a single integer), to look up the rows of subgroups
+        keys = np.ravel_multi_index(combinations.T, shape) if np.prod(shape, dtype=float) < np.iinfo(np.int64).max else None
+        # lookups are faster in the dense marginal, which is also kept if it is no larger than the distinct combinations
+        dense = None
+        if keys is not None and np.prod(shape) <= combinations.size + len(counts):
+            dense = np.bincount(keys, weights=counts, minlength=int(np.prod(shape))).reshape(shape)
+        self._marginals[attributes] = (combinations, counts, keys, dense)
+        if len(self._marginals) > self.max_cached_marginals:
+            self._marginals.popitem(last=False)
+        return combinations, counts
+
+    def _subgroup_counts(self, subgroup:dict[str, int], attributes:tuple[str]) -> np.ndarray:
+        """
+        Dense counts of the subgroup (attribute : code) within the marginal of attributes (which start with those of the subgroup),
+        with an axis for each of the remaining attributes followed by one for the population.
+        """
+        self.marginal(attributes)
+        combinations, counts, keys, dense = self._marginals[attributes]
+        if dense is not None:
+            return dense[tuple(subgroup.values())]
+        shape = (*[self._n_values[att] for att in attributes[len(subgroup):]], self._n_populations)
+        dense = np.zeros(shape)
+        if keys is not None: # the subgroup's rows are those whose position in the dense marginal falls within the subgroup's block
+            block, size = 0, dense.size
+            for (att, code) in subgroup.items():
+                block = block * self._n_values[att] + int(code)
+            start, end = keys.searchsorted(block * size), keys.searchsorted((block + 1) * size)
+            dense.reshape(-1)[keys[start:end] - block * size] = counts[start:end]
+        else:
+            start, end = 0, len(counts)
+            for (i, code) in enumerate(subgroup.values()): # the rows of each successive code are contiguous within those of the previous codes
+                column = combinations[start:end, i]
+                start, end = start + np.searchsorted(column, code, side="left"), start + np.searchsorted(column, code, side="right")
+            dense[tuple(combinations[start:end, len(subgroup):].T)] = counts[start:end]
+        return dense
+
+    def total(self, subgroup:dict[str, int]) -> np.ndarray:
+        """ The number of samples of each population that belong to the subgroup (attribute : code). """
+        return self._subgroup_counts(subgroup, tuple(subgroup))
+
+    def counts(self, subgroup:dict[str, int], attribute:str) -> np.ndarray:
+        """
+        The number of samples of each population within the subgroup (attribute : code) that take each value of attribute.
+        Has shape (number of populations, number of values of attribute).
+        """
+        if attribute in subgroup: # every sample of the subgroup has the same value
+            counts = np.zeros((self._n_populations, self._n_values[attribute]))
+            counts[:, subgroup[attribute]] = self.total(subgroup)
+            return counts
+        return self._subgroup_counts(subgroup, (*subgroup, attribute)).T
+
+
+class CountAccumulator():
+    """
+    Accumulates the joint counts of attribute value codes over successive batches of samples.
+    Only the distinct combinations of values seen so far and their counts are kept, 
+    so memory is bounded by the number of distinct combinations rather than the number of samples.
+
+    Parameters
+    ----------
+    n_values : dict[str, int]
+        The number of distinct codes each attribute may take.
+    """
+    def __init__(self, n_values:dict[str, int]):
+        self._n_values = {**n_values}
+        self._combinations = np.zeros((0, len(n_values)), dtype=np.int64)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self._n_samples = 0
+
+    @property
+    def attributes(self) -> list[str]:
+        return [*self._n_values]
+
+    @property
+    def n_samples(self) -> int:
+        """ The total number of samples accumulated. """
+        return self._n_samples
+
+    def __len__(self):
+        """ The number of distinct combinations of values accumulated. """
+        return len(self._counts)
+
+    def add(self, codes:dict[str, np.ndarray], weights:np.ndarray=None):
+        """ Folds a batch of samples (the code of each sample's value, for each attribute) into the counts. """
+        batch = [np.asarray(codes[att], dtype=np.int64) for att in self.attributes]
+        weights = np.ones(len(batch[0]), dtype=np.int64) if weights is None else np.asarray(weights, dtype=np.int64)
+        columns = [np.concatenate([self._combinations[:, i], batch[i]]) for i in range(len(batch))]
+        self._combinations, self._counts = _distinct_rows(columns, tuple(self._n_values.values()), np.concatenate([self._counts, weights]))
+        self._n_samples += int(weights.sum())
+
+    @property
+    def codes(self) -> dict[str, np.ndarray]:
+        """ The codes of each distinct combination of values, for each attribute. """
+        return {att: self._combinations[:, i] for (i, att) in enumerate(self.attributes)}
+
+    @property
+    def counts(self) -> np.ndarray:
+        """ The number of samples with each distinct combination of values. """
+        return self._counts
+
+
+def _distinct_rows(columns:list[np.ndarray], shape:tuple, weights:np.ndarray=None) -> tuple[np.ndarray, np.ndarray]:
+    """ 
+    Finds the distinct rows of the provided code columns (each column taking values in range(shape[i])) 
+    and the number of times (or the total weight with which) each occurs.
+    """
+    if np.prod(shape, dtype=float) < np.iinfo(np.int64).max:
+        keys, inverse = np.unique(np.ravel_multi_index(columns, shape), return_inverse=True)
+        rows = np.stack(np.unravel_index(keys, shape), axis=1)
+    else: # too many possible combinations to index with a single integer
+        rows, inverse = np.unique(np.stack(columns, axis=1), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    if weights is None:
+        counts = np.bincount(inverse, minlength=len(rows))
+    else:
+        counts = np.bincount(inverse, weights=weights, minlength=len(rows)).astype(np.asarray(weights).dtype)
+    return rows.reshape(-1, len(shape)), counts
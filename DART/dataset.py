@@ -3,19 +3,32 @@ __all__ = [
     "Dataset"
 ]
 
-from collections.abc import Iterable
-from functools import reduce
-from itertools import combinations, product
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import combinations, islice, product
+import json
+import multiprocessing
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import os
 import pandas as pd
+from pathlib import Path
 import pprint
+import time
 import torchhd
 import torch
 from typing import Literal
 
 from .attribute_configuration import AttributeGroup
-from .comparison import Comparison
-from .hypervector_sets import HypervectorSet, CategoricalHypervectorSet
+from .bitmap_index import BitmapIndex
+from .contingency_cube import ContingencyCube, CountAccumulator
+from .comparison import Comparison, ComparisonItem, _Columns
+from .hypervector_sets import HypervectorSet, CategoricalHypervectorSet, NumericHypervectorSet, bundle_counts, hamming_similarity, majority, pack_bits, unpack_bits
 from .parameters import parameters
+from .profiling import CompareStats
+from .utilities import read_files_in_chunks
 
 class Dataset():
     """
@@ -27,32 +40,229 @@ class Dataset():
         Dataset sample information; each row is a unique sample and each column is a unique attribute.
     configurations : :class:`AttributeGroup`
         Configurations of the attributes contained in samples. Only attributes with include = True will be used.
+    weights : str or Iterable, optional
+        The number of samples each row represents (or the name of the column containing them). If None, each row is a single sample.
     """
-    def __init__(self, samples:pd.DataFrame, configurations:AttributeGroup=None):
+    max_cached_populations = 32
+
+    def __init__(self, samples:pd.DataFrame, configurations:AttributeGroup=None, weights:str|Iterable=None):
         if configurations is None:
             configurations = AttributeGroup.default(samples)
+        if isinstance(weights, str):
+            weights = samples[weights]
+        # switch the samples from raw values to integer codes of the binned/grouped values
+        codes = configurations.codes(samples, sorted(configurations.attributes))
+        self._initialize(configurations, pd.DataFrame(codes, index=samples.index), weights)
+    
+    @classmethod
+    def from_files(cls, files:list[str|Path]|str|Path, configurations:AttributeGroup, chunksize:int=100000, ext:str=None, filters:dict=None):
+        """
+        Constructs a :class:`Dataset` from sample files without holding all of their samples in memory.
+        The files are read in chunks, which are binned/grouped and folded into the counts of each distinct combination of attribute values.
+        Each row of the resulting dataset is one such combination, weighted by the number of samples that share it.
+
+        Parameters
+        ----------
+        files : list[str|Path] or str or Path
+            The sample files, see :func:`read_files_in_chunks`.
+        configurations : :class:`AttributeGroup`
+            Configurations of the attributes contained in the files.
+        chunksize : int, default = 100000
+            The (maximum) number of samples read at once.
+        ext : str, optional
+            The file extension to read the files as; if None, determined from each file's suffix.
+        filters : dict, optional
+            Only samples whose value of each column (key) is one of the provided (raw) values are included, see :func:`read_files_to_dataframe`.
+        """
+        attributes = sorted(configurations.attributes)
+        accumulator = CountAccumulator({att: len(configurations[att].labels) for att in attributes})
+        # only the columns of the configured attributes are read
+        for chunk in read_files_in_chunks(files, chunksize=chunksize, ext=ext, columns=attributes, filters=filters):
+            accumulator.add(configurations.codes(chunk, attributes))
+        self = cls.__new__(cls)
+        self._initialize(configurations, pd.DataFrame(accumulator.codes), accumulator.counts)
+        return self
+    
+    def _initialize(self, configurations:AttributeGroup, codes:pd.DataFrame, weights:Iterable=None):
+        """ Sets up the hypervectors and the coded sample columns (shared by all constructors). """
         self._configurations = configurations
-        self._samples = samples[self.attributes].copy() # only the needed attributes
-        if parameters["random_state"] is not None:
-            torch.manual_seed(parameters['random_state']) # fix random state (if not None) prior to hypervector generation
-        self._roles = CategoricalHypervectorSet.from_values(self.attributes)
-        self._basis = {att: HypervectorSet(self.configurations[att]) for att in self.attributes if self.configurations[att].include}
-        # switch the samples from raw values to binned/grouped values
+        # hypervectors are seeded per attribute (see parameters["random_state"]), so the bases are only generated once used,
+        # with the parameters in effect now (i.e., those of the roles) even if they have since changed
+        params = {**parameters}
+        self._roles = CategoricalHypervectorSet.from_values(self.attributes, params)
+        self._basis = _LazyBases(self.configurations, [att for att in self.attributes if self.configurations[att].include], params)
+        self._labels = {att: self.configurations[att].labels for att in self.attributes} # code -> label, in the same order as the keys of the attribute's HypervectorSet
+        self._codes = {att: {label:code for (code, label) in enumerate(labels)} for (att, labels) in self._labels.items()} # label -> code
+        # the codes (and weights) are kept in growable columns and the index labels in chunks, so that appending samples does not copy the dataset
+        self._index = _SampleIndex(codes.index)
+        self._rows = _Columns(**{att: _code_dtype(len(self._labels[att])) for att in self.attributes})
+        self._rows.extend(**{att: codes[att].to_numpy() for att in self.attributes})
+        self._row_weights = None
+        if weights is not None:
+            weights = np.asarray(weights)
+            self._row_weights = _Columns(weight=weights.dtype)
+            self._row_weights.extend(weight=weights)
+        self._bitmaps = BitmapIndex({att: self._rows[att] for att in self.attributes}, {att: len(labels) for (att, labels) in self._labels.items()})
+        self._value_counts = {att: self._bincount(att, self._rows[att], self._weights) for att in self.attributes}
+        self._populations = OrderedDict() # (canonical criteria, attributes) -> ContingencyCube of the population
+        self._cache_stats = {"hits": 0, "misses": 0}
+
+    def _population_cube(self, criteria:dict, attributes:list[str]) -> ContingencyCube:
+        """ 
+        The counts of every combination of values of the attributes within the population meeting the criteria.
+        The most recently used populations are cached (see :meth:`cache_info`) under their canonical criteria (see :meth:`_canonical_criteria`).
+        """
+        key = (self._canonical_criteria(criteria), tuple(attributes))
+        if key in self._populations:
+            self._cache_stats["hits"] += 1
+            self._populations.move_to_end(key)
+            return self._populations[key]
+        self._cache_stats["misses"] += 1
+        codes = {att: self._rows[att] for att in attributes}
+        cube = ContingencyCube(codes, {att: len(self._labels[att]) for att in attributes}, [self._positions(criteria)], self._weights)
+        self._populations[key] = cube
+        if len(self._populations) > self.max_cached_populations:
+            self._populations.popitem(last=False)
+        return cube
+
+    def _canonical_criteria(self, criteria:dict) -> tuple:
+        """ A hashable form of the criteria that is the same for all criteria selecting the same values (regardless of order or repetition). """
+        return tuple(sorted((att, tuple(sorted(set(codes)))) for (att, codes) in self._encode_criteria(criteria).items()))
+
+    def cache_info(self) -> dict:
+        """ The number of hits and misses of the cache of population counts used by :meth:`compare`, and its current and maximum size. """
+        return {**self._cache_stats, "size": len(self._populations), "max_size": self.max_cached_populations}
+
+    def clear_cache(self):
+        """ Discards the cached population counts; called whenever samples are appended or removed. """
+        self._populations.clear()
+
+    def _bincount(self, attribute:str, codes:np.ndarray, weights:np.ndarray=None) -> np.ndarray:
+        """ The number of samples (total weight) with each code of attribute. """
+        return np.bincount(codes, weights=weights, minlength=len(self._labels[attribute]))
+
+    def append(self, samples:pd.DataFrame, weights:str|Iterable=None, ignore_index:bool=False):
+        """
+        Adds samples to the dataset. Only the new samples are binned/grouped; the hypervectors are kept, 
+        the bitmap index is extended with the new samples' bits, and the value counts are updated with those of the new samples.
+
+        Parameters
+        ----------
+        samples : pd.DataFrame
+            The new samples, with (at least) a column for each attribute of the dataset.
+        weights : str or Iterable, optional
+            The number of samples each new row represents (or the name of the column containing them). If None, each row is a single sample.
+        ignore_index : bool, default: False
+            If True, the new samples are indexed after the last (integer) index of the dataset rather than by the index of samples,
+            which otherwise must be unique and may not share any index with the dataset.
+        """
+        if len(samples) < 1:
+            return
+        if isinstance(weights, str):
+            weights = samples[weights]
+        if ignore_index:
+            start = 0 if len(self._index) < 1 else int(self._index.max()) + 1
+            index = pd.RangeIndex(start, start + len(samples))
+        else:
+            index = samples.index
+            if index.has_duplicates:
+                raise Exception(f"The provided samples' indexes are not unique; provide unique indexes or use ignore_index=True.")
+            if self._index.positions(index)[1].any():
+                raise Exception(f"Some of the provided samples' indexes are already indexes of the dataset; provide unique indexes or use ignore_index=True.")
+        codes = self.configurations.codes(samples, self.attributes)
+        codes = {att: np.asarray(codes[att]).astype(self._rows[att].dtype) for att in self.attributes}
+        if weights is not None or self._row_weights is not None:
+            weights = self._extend_weights(weights, len(samples))
         for att in self.attributes:
-            if (t := self.configurations[att].type) == "categorical":
-                mapping = {v:k for (k, values) in self.configurations[att].groups.items() for v in values}
-                self.samples[att] = self.samples[att].map(mapping)
-            elif t == 'numeric':
-                self.samples[att] = self.samples[att].apply(self.configurations[att].bin_value)
-                
+            self._value_counts[att] = self._value_counts[att] + self._bincount(att, codes[att], weights)
+        self._index.append(index)
+        self._rows.extend(**codes)
+        self._bitmaps.append(codes)
+        self.clear_cache()
+
+    def _extend_weights(self, weights:Iterable|None, n:int) -> np.ndarray:
+        """ Appends the weights of n new rows (ones if None), first giving every existing row a weight of one if the dataset was unweighted. """
+        if weights is not None:
+            weights = np.asarray(weights)
+        dtype = weights.dtype if self._row_weights is None else self._row_weights["weight"].dtype
+        if weights is None:
+            weights = np.ones(n, dtype=dtype)
+        if self._row_weights is None or np.result_type(dtype, weights.dtype) != dtype:
+            # the column is only recreated when weights are first provided or need a wider dtype
+            existing = np.ones(len(self._rows), dtype=dtype) if self._row_weights is None else self._row_weights["weight"]
+            self._row_weights = _Columns(weight=np.result_type(dtype, weights.dtype))
+            self._row_weights.extend(weight=existing)
+        self._row_weights.extend(weight=weights)
+        return weights
+
+    def remove(self, indexes:list[int]):
+        """
+        Removes the indicated samples from the dataset. The hypervectors are kept and the value counts are reduced by those of the removed samples.
+        As the positions of the remaining samples shift, the bitmap index is rebuilt.
+        """
+        positions, found = self._index.positions(indexes)
+        if not found.all():
+            missing = [index for (index, is_found) in zip(indexes, found) if not is_found]
+            raise Exception(f"{len(missing)} provided indexes are not indexes of the dataset: {missing}")
+        positions = np.unique(positions)
+        weights = None if self._weights is None else self._weights[positions]
+        for att in self.attributes:
+            self._value_counts[att] = self._value_counts[att] - self._bincount(att, self._rows[att][positions], weights)
+        keep = np.ones(len(self._rows), dtype=bool)
+        keep[positions] = False
+        self._index = _SampleIndex(self._index.labels[keep])
+        rows = _Columns(**{att: self._rows[att].dtype for att in self.attributes})
+        rows.extend(**{att: self._rows[att][keep] for att in self.attributes})
+        self._rows = rows
+        if self._row_weights is not None:
+            row_weights = _Columns(weight=self._weights.dtype)
+            row_weights.extend(weight=self._weights[keep])
+            self._row_weights = row_weights
+        self._bitmaps = BitmapIndex({att: self._rows[att] for att in self.attributes}, {att: len(labels) for (att, labels) in self._labels.items()})
+        self.clear_cache()
 
     @property 
     def configurations(self):
         return self._configurations
     
     @property
-    def samples(self):
-        return self._samples
+    def samples(self) -> pd.DataFrame:
+        """ The binned/grouped value (label) of each attribute for each sample. """
+        return pd.DataFrame(
+            {att: np.array(self._labels[att], dtype=object)[self._rows[att]] for att in self.attributes}, 
+            index=self._index.labels,
+        )
+    
+    @property
+    def codes(self) -> pd.DataFrame:
+        """ 
+        The integer code of the binned/grouped value of each attribute for each sample. 
+        Codes index the keys of the attribute's :class:`HypervectorSet`.
+        """
+        return pd.DataFrame({att: self._rows[att].copy() for att in self.attributes}, index=self._index.labels)
+    
+    @property
+    def weights(self) -> np.ndarray|None:
+        """ The number of samples each row represents, or None if every row is a single sample. """
+        return None if self._weights is None else self._weights.copy()
+
+    @property
+    def _weights(self) -> np.ndarray|None:
+        """ A view of the weights of the rows (see :attr:`weights`). """
+        return None if self._row_weights is None else self._row_weights["weight"]
+    
+    @property
+    def value_counts(self) -> dict[str, np.ndarray]:
+        """ 
+        The number of samples with each (binned/grouped) value of each attribute, ordered to match the keys of the attribute's :class:`HypervectorSet`.
+        Maintained as samples are appended or removed.
+        """
+        return {**self._value_counts}
+    
+    @property
+    def n_samples(self) -> int:
+        """ The total number of samples (the sum of the weights of all rows). """
+        return len(self._rows) if self._weights is None else self._weights.sum().item()
     
     @property
     def attributes(self):
@@ -60,28 +270,63 @@ class Dataset():
     
     def index(self, criteria:dict) -> list[int]:
         """ Gets the indexes of the samples that meet the provided criteria. """
-        temp = self.samples.copy()
+        return self._index.labels[self._positions(criteria)].tolist()
+    
+    def _positions(self, criteria:dict) -> np.ndarray:
+        """ Gets the positions (rather than index labels) of the samples that meet the provided criteria. """
+        return self._bitmaps.positions(self._encode_criteria(criteria))
+    
+    def _encode_criteria(self, criteria:dict) -> dict[str, list[int]]:
+        """ Converts criteria from binned/grouped values (labels) to codes; unrecognized values are dropped as no sample can match them. """
+        encoded = {}
         for att, condition in criteria.items():
-            for att, condition in criteria.items():
-                condition = condition if isinstance(condition, list) else [condition]
-                temp = temp[temp[att].isin(condition)]
-        return temp.index.tolist()
+            condition = condition if isinstance(condition, list) else [condition]
+            encoded[att] = [self._codes[att][value] for value in condition if value in self._codes[att]]
+        return encoded
+        
+    def counts(self, indexes:list[int]) -> dict[str, torch.Tensor]:
+        """ 
+        Counts the number of indicated samples with each (binned/grouped) value of each attribute.
+        Counts are ordered to match the keys of the attribute's :class:`HypervectorSet`.
+        Raises a KeyError if any of the indexes is not an index of the dataset.
+        """
+        positions, found = self._index.positions(indexes)
+        if not found.all():
+            missing = [index for (index, is_found) in zip(indexes, found) if not is_found]
+            raise KeyError(f"{len(missing)} provided indexes are not indexes of the dataset: {missing}")
+        return self._count_positions(positions)
+    
+    def _count_positions(self, positions:np.ndarray) -> dict[str, torch.Tensor]:
+        """ Counts the values of the samples at the provided positions; see :meth:`counts`. """
+        counts = {}
+        for att in self.attributes:
+            weights = None if self._weights is None else self._weights[positions]
+            value_counts = self._bincount(att, self._rows[att][positions], weights)
+            counts[att] = torch.tensor(value_counts, dtype=torch.float).unsqueeze(0)
+        return counts
         
     def encode(self, indexes:list[int]) -> dict:
-        """ Encode the indicated samples into a single hypervector for each attribute """
-        HV = None
-        for idx in indexes:
-            sample_HV = {
-                att: torchhd.bind(
-                    self._roles[att],
-                    self._basis[att][self.samples.at[idx, att]]
-                ) for att in self.attributes
-            }
-            if HV is None:
-                HV = {**sample_HV}
-            else:
-                HV = {att:torchhd.bundle(HV[att], sample_HV[att]) for att in self.attributes}
-        return HV
+        """ Encode the indicated samples into a single hypervector for each attribute (bit-packed under the "BSC" architecture) """
+        if len(indexes) < 1:
+            return None
+        return self._encode_all(self.counts(indexes))
+    
+    def _encode_all(self, counts:dict[str, torch.Tensor]) -> dict:
+        return {att: self._encode_counts(att, counts[att]) for att in self.attributes}
+    
+    def _encode_counts(self, attribute:str, counts:torch.Tensor) -> torch.Tensor:
+        """ 
+        Encodes the value counts of a single attribute into a hypervector.
+        Under MAP, bundling the bound role/basis hypervectors of every sample is equivalent to binding the role 
+        to the count-weighted sum of the basis hypervectors, so a single matmul replaces the per-sample loop.
+        Integer (e.g., int8) basis hypervectors are accumulated in the dtype of the counts, converting only the rows of the values present (see :func:`bundle_counts`).
+        Under BSC, the majority of the basis hypervectors is taken from the count-weighted number of set bits of each dimension
+        and bound (XOR) to the role, which is equivalent as binding commutes with the majority.
+        """
+        bundled = self._basis[attribute].counts_to_vector(counts)
+        if self._roles.architecture == "BSC":
+            return torch.bitwise_xor(self._roles[attribute], bundled)
+        return torchhd.bind(self._roles[attribute], bundled)
     
     def subgroups(self,
                   max_level:int,
@@ -100,7 +345,8 @@ class Dataset():
         """
         for level in range(max_level+1):
             for attribute_combination in combinations(attributes, level):
-                for attribute_values in product(*[self.samples[att].unique() for att in attribute_combination]):
+                present_values = [[self._labels[att][code] for code in pd.unique(self._rows[att])] for att in attribute_combination]
+                for attribute_values in product(*present_values):
                     yield dict(zip(attribute_combination, attribute_values))
 
     def compare(self, 
@@ -111,6 +357,10 @@ class Dataset():
                 ignore_inherent:bool=True,
                 max_intersectionality_level:int=0,
                 comparison_type:Literal["default", "extensive", "overall", "individual"]="default",
+                similarity_mode:Literal["hypervector", "gram"]="hypervector",
+                n_jobs:int=1,
+                profile:bool=False,
+                callback:Callable[[CompareStats], None]=None,
                 ) -> Comparison:
         """
         Runs a series of comparisons between the indicated populations
@@ -141,19 +391,114 @@ class Dataset():
             "individual" - measure separately for each attribute
             "overall" - take one measurement that encorperates all similarity attributes
             "default" - individual + overall
-            "extensive" - take a measurement for every possible combination of similarity attributes
+            "extensive" - take a measurement for every possible combination of similarity attributes 
+            (the number of combinations may be limited with parameters["comparison.max_combinations"])
+        
+        similarity_mode : {"hypervector", "gram"}, default: "hypervector"
+            How the similarity values are computed.
+            "hypervector" - encode each population into hypervectors and measure their cosine similarity
+            (under BSC, the Hamming similarity 1 - 2 * distance / dimensions of their majority bundles)
+            "gram" - evaluate the same cosine similarity exactly from the populations' value counts and the precomputed 
+            inner products between the role-bound basis hypervectors, without creating any population hypervectors (MAP only)
+        
+        n_jobs : int, default: 1
+            The number of worker processes across which the subgroups are divided. If -1, uses all available CPUs.
+            Workers attach to the sample codes and basis hypervectors through shared memory rather than receiving copies,
+            and results are merged in the same order as a serial comparison.
+            As workers are spawned, scripts using n_jobs != 1 must guard their entry point with ``if __name__ == "__main__":``.
+            A new pool is started by every call, and each worker imports torch before it can start, which takes seconds;
+            parallelism therefore only pays off for sweeps whose serial run takes considerably longer than that.
+            Any other value raises a ValueError.
+        
+        profile : bool, default: False
+            Whether to collect per-phase timers and counters of the comparison (see :class:`CompareStats`), 
+            which are attached to the returned :class:`Comparison` as its stats.
+        
+        callback : callable, optional
+            Called with the :class:`CompareStats` of the comparison after each subgroup is measured (e.g., to report progress);
+            implies profile = True.
         
         Returns
         -------
         :class:`Comparison`
         """
+        start_time = time.perf_counter()
+        stats = CompareStats() if (profile or callback is not None) else None
+        comparisons = Comparison(criteria1, criteria2, ignore_inherent, stats=stats)
+        timer = (lambda phase: nullcontext()) if stats is None else stats.time
+        for (subgroup, insufficient_samples, similarity_values) in self._compare_results(criteria1, criteria2, similarity_attributes, subgroup_attributes, ignore_inherent, 
+                                                                                           max_intersectionality_level, comparison_type, similarity_mode, n_jobs, stats, callback):
+            with timer("bookkeeping"):
+                comparisons.add(subgroup, similarity_values, insufficient_samples)
+        if stats is not None:
+            stats.timers["total"] = time.perf_counter() - start_time
+        return comparisons
+    
+    def compare_iter(self, 
+                     criteria1:dict|list|int, 
+                     criteria2:dict|list|int, 
+                     similarity_attributes:list[str]|str=None,
+                     subgroup_attributes:list[str]|str=None,
+                     ignore_inherent:bool=True,
+                     max_intersectionality_level:int=0,
+                     comparison_type:Literal["default", "extensive", "overall", "individual"]="default",
+                     similarity_mode:Literal["hypervector", "gram"]="hypervector",
+                     n_jobs:int=1,
+                     profile:bool=False,
+                     callback:Callable[[CompareStats], None]=None,
+                     start:int=0,
+                     after:dict=None,
+                     ) -> Iterator[ComparisonItem]:
+        """
+        Runs the same comparisons as :meth:`compare`, yielding the :class:`ComparisonItem` of each subgroup as soon as it is measured 
+        rather than returning them all at once, so that sweeps too large to hold in memory can be written out as they progress (see :mod:`DART.writers`).
+        Each item belongs to its own single-item :class:`Comparison` (sharing the stats of the sweep, if profiled).
+
+        Parameters
+        ----------
+        criteria1, criteria2, similarity_attributes, subgroup_attributes, ignore_inherent, max_intersectionality_level, comparison_type, similarity_mode, n_jobs, profile, callback
+            See :meth:`compare`.
+        
+        start : int, default: 0
+            The number of subgroups to skip (in the order they are yielded), e.g., to resume an interrupted sweep (see :meth:`ResultWriter.write_sweep`).
+            Subgroups are enumerated in the same order in every process, so a sweep can be resumed from a new one.
+        
+        after : dict, optional
+            The subgroup expected just before start (e.g., the last subgroup written before the sweep was interrupted);
+            raises an Exception if the subgroup of the sweep at start - 1 differs.
+        """
+        start_time = time.perf_counter()
+        stats = CompareStats() if (profile or callback is not None) else None
+        timer = (lambda phase: nullcontext()) if stats is None else stats.time
+        for (subgroup, insufficient_samples, similarity_values) in self._compare_results(criteria1, criteria2, similarity_attributes, subgroup_attributes, ignore_inherent, 
+                                                                                           max_intersectionality_level, comparison_type, similarity_mode, n_jobs, stats, callback, start, after):
+            with timer("bookkeeping"):
+                comparison = Comparison(criteria1, criteria2, ignore_inherent, stats=stats)
+                comparison.add(subgroup, similarity_values, insufficient_samples)
+            yield comparison[0]
+            if stats is not None:
+                stats.timers["total"] = time.perf_counter() - start_time
+    
+    def _compare_results(self, criteria1:dict, criteria2:dict, similarity_attributes:list[str]|str, subgroup_attributes:list[str]|str, ignore_inherent:bool, 
+                         max_intersectionality_level:int, comparison_type:str, similarity_mode:str, n_jobs:int, stats:CompareStats=None, 
+                         callback:Callable=None, start:int=0, after:dict=None) -> Iterator[tuple[dict, bool, dict]]:
+        """ 
+        Yields the subgroup, whether either population had no samples in it, and its similarity values, for each subgroup of a comparison (see :meth:`compare`).
+        Stats (if provided) are updated and the callback is called once the consumer has handled each subgroup.
+        """
         assert comparison_type in ["individual", "overall", "default", "extensive"]
+        assert similarity_mode in ["hypervector", "gram"]
+        if not isinstance(n_jobs, int) or isinstance(n_jobs, bool) or not (n_jobs == -1 or n_jobs >= 1):
+            raise ValueError(f"n_jobs must be -1 or a positive integer, not {n_jobs!r}")
+        if similarity_mode == "gram" and self._roles.architecture != "MAP":
+            raise Exception(f"similarity_mode \"gram\" is only supported for the \"MAP\" architecture.")
         inherent_attributes = set([x for criteria in [criteria1, criteria2] for x in criteria])
         if similarity_attributes is None:
             similarity_attributes = [*self.attributes]
         elif isinstance(similarity_attributes, str):
             similarity_attributes = [similarity_attributes]
-        noninherent_attributes = list(set(similarity_attributes).difference(inherent_attributes))
+        # attributes are sorted so that subgroups are enumerated in the same order in every process (e.g., when resuming with compare_iter)
+        noninherent_attributes = sorted(set(similarity_attributes).difference(inherent_attributes))
         if subgroup_attributes is None:
             subgroup_attributes = [*noninherent_attributes]
         elif isinstance(subgroup_attributes, str):
@@ -162,49 +507,486 @@ class Dataset():
             overlap = list(inherent_attributes.intersection(set(subgroup_attributes)))
             print(f"WARNING: cannot use any of the attributes in provided criteria to further define intersectional subgroups. Removing the following attribute(s) from subgroup_attributes: {overlap}")
             subgroup_attributes = list(set(subgroup_attributes).difference(inherent_attributes))
+        subgroup_attributes = sorted(set(subgroup_attributes))
         if max_intersectionality_level == -1:
             max_intersectionality_level = len(noninherent_attributes)
-        comparisons = Comparison(criteria1, criteria2, ignore_inherent)
-        for subgroup in self.subgroups(max_intersectionality_level, subgroup_attributes):
-            indexes1 = self.index({**criteria1, **subgroup})
-            indexes2 = self.index({**criteria2, **subgroup})
-            if len(indexes1) < 1 or len(indexes2) < 1:
-                comparisons.add(subgroup, {}, True)
-                continue # nothing to compare!
-            # determine the attribute combinations to compare (similarity from)
-            available_attributes = set(similarity_attributes)
-            if ignore_inherent:
-                available_attributes = set(similarity_attributes).difference(set([*subgroup, *inherent_attributes]))
-            
-            if len(available_attributes) == 1: # same for every comparison_type
-                sim_combinations = [tuple(available_attributes)]
-            else:
-                sim_combinations = []
-                if comparison_type in ["overall", "default", "extensive"]:
-                    sim_combinations.append(tuple(available_attributes))
-                if comparison_type in ["individual", "default", "extensive"]:
-                    sim_combinations += [(att,) for att in available_attributes]
-                if comparison_type in ["extensive"] and len(available_attributes) > 2:
-                    for i in range(2, len(available_attributes)):
-                        sim_combinations += [*combinations(available_attributes, i)]
-            # encode the samples
-            HVs1 = self.encode(indexes1)
-            HVs2 = self.encode(indexes2)
-            # iterate through the similarity attribute combinations
-            similarity_values = {}
-            for sim_atts in sim_combinations:
-                if len(sim_atts) < 1:
-                    continue
-                HV1 = reduce(torchhd.bundle, [HVs1[att] for att in sim_atts])
-                HV2 = reduce(torchhd.bundle, [HVs2[att] for att in sim_atts])
-                similarity_values[sim_atts] = torchhd.cosine_similarity(HV1, HV2).item()
-            comparisons.add(subgroup, similarity_values, False)
-        return comparisons
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
+        timer = (lambda phase: nullcontext()) if stats is None else stats.time
+        # count every combination of attribute values in each population; subgroup counts are marginals of these cubes
+        cube_attributes = sorted(set(similarity_attributes).union(subgroup_attributes))
+        n_values = {att: len(self._labels[att]) for att in cube_attributes}
+        with timer("index"):
+            cube = ContingencyCube.stack([self._population_cube(criteria, cube_attributes) for criteria in [criteria1, criteria2]])
+        with timer("prepare"):
+            (bound, offsets, levels, gram) = self._prepare(n_values, similarity_attributes, similarity_mode)
+        n_subgroups = max(0, self._n_subgroups(max_intersectionality_level, subgroup_attributes) - start)
+        if stats is not None:
+            stats.n_subgroups = n_subgroups
+            stats.allocate(len(bound), bound.nbytes, shared=True)
+            if gram is not None:
+                stats.allocate(0, gram.nbytes, shared=True)
+        settings = dict(comparison_type=comparison_type, similarity_mode=similarity_mode, max_combinations=parameters["comparison.max_combinations"], 
+                        architecture=self._roles.architecture, levels=levels)
+        # determine the attribute combinations available to compare (similarity from) in each subgroup
+        def tasks():
+            for subgroup in self.subgroups(max_intersectionality_level, subgroup_attributes):
+                available_attributes = set(similarity_attributes)
+                if ignore_inherent:
+                    available_attributes = set(similarity_attributes).difference(set([*subgroup, *inherent_attributes]))
+                subgroup_codes = {att: self._codes[att][value] for (att, value) in subgroup.items()}
+                yield (subgroup, subgroup_codes, sorted(available_attributes))
+        remaining = islice(tasks(), start, None)
+        if start > 0 and after is not None:
+            remaining = tasks()
+            skipped = deque(enumerate(islice(remaining, start), 1), maxlen=1) # (the number of subgroups skipped, the last of them)
+            found = skipped[0][1][0] if len(skipped) > 0 and skipped[0][0] == start else None
+            if found is None or _subgroup_key(found) != _subgroup_key(after):
+                raise Exception(f"Cannot resume the comparison after subgroup {start - 1}: expected {after}, but the comparison's subgroup {start - 1} is {found}.")
+        if n_jobs == 1:
+            comparer = _SubgroupComparer(cube, bound, offsets, similarity_attributes, gram, **settings, stats=stats)
+            results = ((subgroup, *comparer(subgroup_codes, available_attributes)) for (subgroup, subgroup_codes, available_attributes) in remaining)
+        else:
+            results = self._compare_parallel(remaining, n_subgroups, n_jobs, cube, n_values, bound, offsets, similarity_attributes, gram, settings, stats)
+        for (subgroup, insufficient_samples, similarity_values) in results:
+            yield (subgroup, insufficient_samples, similarity_values)
+            if stats is not None:
+                stats.record(insufficient_samples, similarity_values)
+            if callback is not None:
+                callback(stats)
+    
+    def _prepare(self, n_values:dict[str, int], similarity_attributes:list[str], similarity_mode:str) -> tuple:
+        """ 
+        The role-bound basis hypervectors of the similarity attributes (stacked in their order), the row at which those of each attribute start, 
+        the numeric attributes that are bundled from their counts instead (see :class:`_SubgroupComparer`), and, in "gram" mode, the inner products of the rows.
+        """
+        architecture = self._roles.architecture
+        roles = dict(zip(similarity_attributes, self._roles.gather(similarity_attributes).unsqueeze(1)))
+        levels = {} # numeric attributes whose populations are bundled from their counts of each level rather than from rows of bound
+        if architecture == "BSC": # the set bits of the bound hypervectors are counted, so they are unpacked
+            bound = torch.cat([unpack_bits(torch.bitwise_xor(roles[att], self._basis[att].values), self._roles.dimensions) for att in similarity_attributes]).to(torch.float)
+        else:
+            if similarity_mode == "hypervector":
+                levels = {att: (roles[att].as_subclass(torch.Tensor), self._basis[att]) for att in similarity_attributes if isinstance(self._basis[att], NumericHypervectorSet)}
+            bound = [torchhd.bind(roles[att], self._basis[att].values).as_subclass(torch.Tensor) for att in similarity_attributes if att not in levels]
+            bound = torch.cat(bound) if len(bound) > 0 else torch.zeros((0, self._roles.dimensions), dtype=self._roles.values.dtype)
+        offsets = np.cumsum([0, *[0 if att in levels else n_values[att] for att in similarity_attributes]])
+        gram = None
+        if similarity_mode == "gram":
+            gram = torch.matmul(bound.to(torch.float64), bound.T.to(torch.float64)).numpy()
+        return (bound, offsets, levels, gram)
+    
+    def _n_subgroups(self, max_level:int, attributes:list) -> int:
+        """ The number of subgroups yielded by :meth:`subgroups` with the same settings. """
+        n_present = {att: len(pd.unique(self._rows[att])) for att in attributes}
+        return sum([int(np.prod([n_present[att] for att in combination])) for level in range(max_level+1) for combination in combinations(attributes, level)])
+    
+    def _compare_parallel(self, tasks:Iterator[tuple], n_tasks:int, n_jobs:int, cube:ContingencyCube, n_values:dict[str, int], bound:torch.Tensor, offsets:np.ndarray,
+                          similarity_attributes:list[str], gram:np.ndarray, settings:dict, stats:CompareStats=None) -> Iterator[tuple[dict, bool, dict]]:
+        """ 
+        Measures the (n_tasks) subgroups of the tasks of :meth:`compare` across n_jobs worker processes, yielding their results in order.
+        Subgroups are divided into chunks, which are measured by a pool of workers sharing the cube and basis hypervectors;
+        at most two chunks per worker are pending at once, so results are not accumulated faster than they are consumed.
+        """
+        chunk_size = max(1, -(-n_tasks // (4 * n_jobs)))
+        pending = deque() # the subgroups of each submitted chunk and the future of its results
+        shared = {}
+        executor = None
+        try:
+            for (name, array) in [("combinations", cube.rows[0]), ("counts", cube.rows[1]), ("bound", bound.numpy())]:
+                shared[name] = _SharedArray.create(array)
+            initargs = (
+                cube.attributes, n_values, cube.n_populations, shared["combinations"].spec, shared["counts"].spec, 
+                shared["bound"].spec, offsets, similarity_attributes, gram, settings, stats is not None,
+            )
+            executor = ProcessPoolExecutor(n_jobs, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker, initargs=initargs)
+            def submit():
+                chunk = [*islice(tasks, chunk_size)]
+                if len(chunk) > 0:
+                    pending.append(([subgroup for (subgroup, _, _) in chunk], executor.submit(_compare_chunk, [(c, a) for (_, c, a) in chunk])))
+            for _ in range(2 * n_jobs):
+                submit()
+            while len(pending) > 0:
+                (subgroups, future) = pending.popleft()
+                (chunk_results, chunk_stats) = future.result()
+                submit()
+                if stats is not None:
+                    stats.merge(chunk_stats)
+                for (subgroup, (insufficient_samples, similarity_values)) in zip(subgroups, chunk_results):
+                    yield (subgroup, insufficient_samples, similarity_values)
+        finally:
+            if executor is not None: # e.g., if the consumer stopped early, unstarted chunks are cancelled
+                executor.shutdown(cancel_futures=True)
+            for array in shared.values():
+                array.release(unlink=True)
     
     def __repr__(self) -> str:
         class_name = self.__class__.__name__
         indent = len(class_name) + 1
-        repr = ('\n' + ' '*indent).join(pprint.pformat({"Attributes":self.attributes, "Number of samples": len(self.samples)}, indent=1, width=80 - indent).split("\n"))
+        repr = ('\n' + ' '*indent).join(pprint.pformat({"Attributes":self.attributes, "Number of samples": self.n_samples}, indent=1, width=80 - indent).split("\n"))
         return f"{class_name}({repr})"
 
-        
+
+class _SubgroupComparer():
+    """ 
+    Measures the similarity of the two populations of a comparison within individual subgroups.
+
+    Parameters
+    ----------
+    cube : :class:`ContingencyCube`
+        Counts of the two populations.
+    bound : torch.Tensor
+        The role-bound basis hypervectors of all values of the similarity attributes, stacked in the order of attributes.
+    offsets : np.ndarray
+        The row of bound at which the hypervectors of each attribute start (with a final entry for the total number of rows).
+    attributes : list[str]
+        The similarity attributes.
+    gram : np.ndarray or None
+        Inner products between the rows of bound; required if similarity_mode is "gram".
+    comparison_type, similarity_mode, max_combinations
+        See :meth:`Dataset.compare` and parameters["comparison.max_combinations"].
+    architecture : str
+        The hypervector architecture; under "BSC", bound holds the unpacked (0/1) bits of the bound hypervectors.
+        Integer (e.g., int8) bound hypervectors are kept as they are; only the rows each subgroup needs are converted as it is encoded (see :func:`bundle_counts`),
+        to float32 if that holds the bundles exactly (i.e., if the counts are integers and each population has fewer than 2**24 samples) and otherwise to float64.
+    levels : dict[str, tuple[torch.Tensor, NumericHypervectorSet]], optional
+        The role and level hypervectors of numeric attributes that are bundled from their counts (see :meth:`NumericHypervectorSet.counts_to_vector`)
+        rather than from rows of bound (in which they have no rows).
+    stats : :class:`CompareStats`, optional
+        If provided, the time spent in each per-subgroup phase and the hypervectors allocated are recorded to it.
+    """
+    def __init__(self, cube:ContingencyCube, bound:torch.Tensor, offsets:np.ndarray, attributes:list[str], gram:np.ndarray, 
+                 comparison_type:str, similarity_mode:str, max_combinations:int, architecture:str="MAP", levels:dict=None, stats:CompareStats=None):
+        self._cube = cube
+        self._offsets = {att: (int(offsets[i]), int(offsets[i+1])) for (i, att) in enumerate(attributes)}
+        self._bound = {att: bound[start:end] for (att, (start, end)) in self._offsets.items()}
+        self._dtype = bound.dtype
+        if not bound.is_floating_point():
+            combinations, counts = cube.rows
+            totals = np.bincount(combinations[:, 0], weights=counts, minlength=cube.n_populations)
+            exact = (np.asarray(counts) == np.round(counts)).all() and (totals < 2**24).all()
+            self._dtype = torch.float32 if exact else torch.float64
+        self._levels = {} if levels is None else levels
+        self._gram = gram
+        self._comparison_type = comparison_type
+        self._similarity_mode = similarity_mode
+        self._max_combinations = max_combinations
+        self._architecture = architecture
+        self._dimensions = bound.shape[-1]
+        self.stats = stats
+
+    def _time(self, phase:str):
+        return nullcontext() if self.stats is None else self.stats.time(phase)
+
+    def __call__(self, subgroup_codes:dict[str, int], available_attributes:list[str]) -> tuple[bool, dict]:
+        """ Returns whether either population has no samples in the subgroup, and the similarity values of the subgroup. """
+        with self._time("marginals"):
+            if (self._cube.total(subgroup_codes) < 1).any():
+                return (True, {}) # nothing to compare!
+            if len(available_attributes) < 1:
+                return (False, {})
+            counts = {att: self._cube.counts(subgroup_codes, att) for att in available_attributes}
+        HVs = None
+        if self._similarity_mode == "hypervector":
+            with self._time("encode"):
+                HVs = self.encode(counts, available_attributes)
+        with self._time("bundle"):
+            similarity_values = self._similarities(HVs, counts, available_attributes)
+        if self.stats is not None:
+            self._record_allocations(HVs, len(similarity_values), counts)
+        return (False, similarity_values)
+
+    def _record_allocations(self, HVs:torch.Tensor, n_combinations:int, counts:dict[str, np.ndarray]):
+        """ 
+        Records the hypervectors allocated for a subgroup to the stats: its population encodings, the bundles of each combination,
+        and (with integer bound hypervectors) the largest set of rows converted to encode an attribute.
+        """
+        if HVs is not None:
+            self.stats.allocate(HVs.shape[0] * HVs.shape[1], HVs.nbytes)
+            converted = [int(counts[att].any(axis=0).sum()) for att in counts if att not in self._levels and self._dtype != self._bound[att].dtype]
+            if len(converted) > 0:
+                self.stats.allocate(0, max(converted) * self._dimensions * self._dtype.itemsize)
+            if self._architecture == "BSC": # bundled in batches (see _majority_similarities)
+                self.stats.allocate(2 * n_combinations, 2 * min(n_combinations, 256) * self._dimensions * HVs.element_size())
+            elif self._comparison_type != "extensive": # extensive comparisons are evaluated from inner products without bundling
+                self.stats.allocate(2 * n_combinations, 2 * n_combinations * self._dimensions * 8) # float64
+        self.stats.release()
+
+    def _similarities(self, HVs:torch.Tensor, counts:dict[str, np.ndarray], available_attributes:list[str]) -> dict[tuple, float]:
+        """ The similarity values of a subgroup with the provided value counts (and, in "hypervector" mode, population encodings). """
+        if self._comparison_type == "extensive":
+            n_combinations = 2**len(available_attributes) - 1
+            if self._max_combinations is not None and n_combinations > self._max_combinations:
+                raise Exception(f"An extensive comparison of {len(available_attributes)} attributes requires {n_combinations} combinations, which exceeds the maximum set by parameters[\"comparison.max_combinations\"] ({self._max_combinations}).")
+            if self._architecture == "BSC": # majority bundles are not linear, so every combination is bundled separately
+                sim_combinations = [c for level in range(len(available_attributes), 0, -1) for c in combinations(available_attributes, level)]
+                sim_combinations = sorted(sim_combinations, key=lambda combination: _combination_order(combination, available_attributes))
+                return self._majority_similarities(HVs, counts, available_attributes, sim_combinations)
+            # every combination is visited in Gray code order, reusing the running inner products of the previous combination
+            if self._similarity_mode == "gram":
+                inner = self.gram_inner_products(counts, available_attributes)
+            else:
+                inner = torch.matmul(HVs.unsqueeze(1).to(torch.float64), HVs.transpose(-2, -1).to(torch.float64))
+            similarity_values = _gray_code_similarities(inner.numpy(), available_attributes)
+            return dict(sorted(similarity_values, key=lambda item: _combination_order(item[0], available_attributes)))
+        sim_combinations = _similarity_combinations(available_attributes, self._comparison_type)
+        # each row selects the attributes bundled together for one combination
+        selection = torch.tensor([[att in sim_atts for att in available_attributes] for sim_atts in sim_combinations], dtype=torch.float64)
+        if self._similarity_mode == "gram":
+            similarities = _quadratic_similarities(self.gram_inner_products(counts, available_attributes), selection)
+        elif self._architecture == "BSC":
+            return self._majority_similarities(HVs, counts, available_attributes, sim_combinations)
+        else:
+            similarities = _bundle_similarities(HVs, selection)
+        return dict(zip(sim_combinations, similarities.tolist()))
+
+    def encode(self, counts:dict[str, np.ndarray], attributes:list[str]) -> torch.Tensor:
+        """ 
+        Encodes the two populations from their value counts.
+        counts[att] has shape (2, number of values of att); the result is indexed [population, attribute, dimension].
+        """
+        return torch.stack([self._encode(counts[att], att) for att in attributes], dim=1)
+
+    def _encode(self, counts:np.ndarray, attribute:str) -> torch.Tensor:
+        """ Encodes the two populations wrt a single attribute from their value counts. """
+        if attribute not in self._levels and self._dtype != self._bound[attribute].dtype:
+            return bundle_counts(counts, self._bound[attribute], self._dtype)
+        counts = torch.tensor(counts, dtype=self._dtype)
+        if attribute in self._levels:
+            role, levels = self._levels[attribute]
+            return role * levels.counts_to_vector(counts).as_subclass(torch.Tensor)
+        return torch.matmul(counts, self._bound[attribute])
+
+    def _majority_similarities(self, HVs:torch.Tensor, counts:dict[str, np.ndarray], attributes:list[str], sim_combinations:list[tuple], 
+                               batch_size:int=256) -> dict[tuple, float]:
+        """
+        The Hamming similarity of the majority bundles of the two populations for each combination of attributes (under BSC).
+        HVs holds the number of samples with each bit set, indexed [population, attribute, dimension] (see :meth:`encode`).
+        """
+        totals = torch.tensor(np.stack([counts[att].sum(axis=1) for att in attributes], axis=1), dtype=HVs.dtype) # [population, attribute]
+        similarities = []
+        for i in range(0, len(sim_combinations), batch_size):
+            batch = sim_combinations[i:i+batch_size]
+            selection = torch.tensor([[att in sim_atts for att in attributes] for sim_atts in batch], dtype=HVs.dtype)
+            bundles = pack_bits(majority(torch.matmul(selection, HVs), torch.matmul(totals, selection.T))) # [population, combination, word]
+            similarities += hamming_similarity(bundles[0], bundles[1], HVs.shape[-1]).tolist()
+        return dict(zip(sim_combinations, similarities))
+
+    def gram_inner_products(self, counts:dict[str, np.ndarray], attributes:list[str]) -> torch.Tensor:
+        """ 
+        The inner products between the per-attribute encodings of the two populations, evaluated from their value counts and the gram matrix.
+        counts[att] has shape (2, number of values of att); the result is indexed [population, population, attribute, attribute].
+        """
+        # lay out the counts of each attribute in its own row so that products with the gram matrix give attribute level inner products
+        C = torch.zeros((2, len(attributes), len(self._gram)), dtype=torch.float64)
+        for i, att in enumerate(attributes):
+            start, end = self._offsets[att]
+            C[:, i, start:end] = torch.from_numpy(counts[att])
+        return torch.matmul(torch.matmul(C, torch.from_numpy(self._gram)).unsqueeze(1), C.transpose(-2, -1))
+
+
+class _SampleIndex():
+    """
+    The index labels of the samples, kept as a few chunks so that appending labels does not rebuild the whole index.
+    An appended chunk is merged into the previous one while that one is no longer (like the digits of a binary counter), 
+    so there are O(log n) chunks and each label is copied O(log n) times.
+    """
+    def __init__(self, labels:pd.Index):
+        self._chunks = [labels]
+        self._maxima = [None] # the maximum label of each chunk, once computed
+
+    def __len__(self):
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def append(self, labels:pd.Index):
+        self._chunks.append(labels)
+        self._maxima.append(None)
+        while len(self._chunks) > 1 and len(self._chunks[-2]) <= len(self._chunks[-1]):
+            self._merge_last()
+
+    def _merge_last(self):
+        chunk, maximum = self._chunks.pop(), self._maxima.pop()
+        self._chunks[-1] = self._chunks[-1].append(chunk)
+        self._maxima[-1] = None if maximum is None or self._maxima[-1] is None else max(maximum, self._maxima[-1])
+
+    @property
+    def labels(self) -> pd.Index:
+        """ All the labels, in the order of the samples. """
+        while len(self._chunks) > 1:
+            self._merge_last()
+        return self._chunks[0]
+
+    def max(self):
+        self._maxima = [chunk.max() if maximum is None else maximum for (chunk, maximum) in zip(self._chunks, self._maxima)]
+        return max(self._maxima)
+
+    def positions(self, labels:Iterable) -> tuple[np.ndarray, np.ndarray]:
+        """ The positions of the samples with the provided labels (all of them for repeated labels), and whether each provided label was found. """
+        positions, found, offset = [], np.zeros(len(labels), dtype=bool), 0
+        for chunk in self._chunks:
+            indexer, missing = chunk.get_indexer_non_unique(labels)
+            positions.append(indexer[indexer >= 0] + offset)
+            in_chunk = np.ones(len(labels), dtype=bool)
+            in_chunk[missing] = False
+            found |= in_chunk
+            offset += len(chunk)
+        return np.concatenate(positions), found
+
+
+class _LazyBases(Mapping):
+    """ 
+    Maps attributes to their basis :class:`HypervectorSet`, which is only created (with the provided parameters) when the attribute is first accessed.
+    """
+    def __init__(self, configurations:AttributeGroup, attributes:list[str], params:dict):
+        self._configurations = configurations
+        self._attributes = [*attributes]
+        self._parameters = {**params}
+        self._bases = {}
+
+    def __getitem__(self, attribute:str) -> HypervectorSet:
+        if attribute not in self._bases:
+            if attribute not in self._attributes:
+                raise KeyError(attribute)
+            self._bases[attribute] = HypervectorSet(self._configurations[attribute], self._parameters)
+        return self._bases[attribute]
+
+    def __contains__(self, attribute:str) -> bool:
+        return attribute in self._attributes
+
+    def __iter__(self):
+        yield from self._attributes
+
+    def __len__(self):
+        return len(self._attributes)
+
+
+class _SharedArray():
+    """ A numpy array stored in shared memory, which other processes can attach to from its spec. """
+    def __init__(self, memory:SharedMemory, spec:tuple):
+        self._memory = memory
+        self.spec = spec
+        (_, shape, dtype) = spec
+        self.array = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+    @classmethod
+    def create(cls, array:np.ndarray):
+        array = np.ascontiguousarray(array)
+        memory = SharedMemory(create=True, size=max(array.nbytes, 1))
+        self = cls(memory, (memory.name, array.shape, array.dtype.str))
+        self.array[...] = array
+        return self
+    
+    @classmethod
+    def attach(cls, spec:tuple):
+        return cls(SharedMemory(name=spec[0]), spec)
+    
+    def release(self, unlink:bool=False):
+        del self.array
+        self._memory.close()
+        if unlink:
+            self._memory.unlink()
+
+
+_worker = {} # state of a worker process of a parallel Dataset.compare
+
+
+def _init_worker(cube_attributes:list[str], n_values:dict[str, int], n_populations:int, combinations:tuple, counts:tuple, bound:tuple, offsets:np.ndarray, 
+                 attributes:list[str], gram:np.ndarray, settings:dict, profile:bool=False):
+    """ Attaches a worker process to the shared arrays of a parallel :meth:`Dataset.compare`. """
+    torch.set_num_threads(1) # parallelism comes from the number of workers
+    shared = {name: _SharedArray.attach(spec) for (name, spec) in [("combinations", combinations), ("counts", counts), ("bound", bound)]}
+    cube = ContingencyCube.from_rows(cube_attributes, n_values, n_populations, shared["combinations"].array, shared["counts"].array)
+    _worker["shared"] = shared
+    _worker["comparer"] = _SubgroupComparer(cube, torch.from_numpy(shared["bound"].array), offsets, attributes, gram, **settings)
+    _worker["profile"] = profile
+
+
+def _compare_chunk(tasks:list[tuple[dict, list]]) -> tuple[list[tuple[bool, dict]], CompareStats|None]:
+    """ Measures a chunk of subgroups in a worker process, returning their results and (if profiling) the stats of the chunk. """
+    comparer = _worker["comparer"]
+    comparer.stats = CompareStats() if _worker["profile"] else None
+    return ([comparer(subgroup_codes, available_attributes) for (subgroup_codes, available_attributes) in tasks], comparer.stats)
+
+
+def _subgroup_key(subgroup:dict) -> str:
+    """ A form of a subgroup that is the same after a round trip through JSON (e.g., that of a :class:`ResultWriter` checkpoint). """
+    return json.dumps(subgroup, sort_keys=True, default=str)
+
+
+def _similarity_combinations(attributes:list[str], comparison_type:str) -> list[tuple]:
+    """ 
+    The combinations of the available similarity attributes to measure the similarity wrt, for the comparison_type (see :meth:`Dataset.compare`). 
+    "extensive" comparisons are enumerated by :func:`_gray_code_similarities` instead.
+    """
+    if len(attributes) == 1: # same for every comparison_type
+        return [tuple(attributes)]
+    sim_combinations = []
+    if comparison_type in ["overall", "default"]:
+        sim_combinations.append(tuple(attributes))
+    if comparison_type in ["individual", "default"]:
+        sim_combinations += [(att,) for att in attributes]
+    return sim_combinations
+
+
+def _combination_order(combination:tuple, attributes:list[str]) -> tuple:
+    """ Sort key placing the combination of all attributes first, followed by combinations of increasing size (in the order of itertools.combinations). """
+    return (len(combination) != len(attributes), len(combination), [attributes.index(att) for att in combination])
+
+
+def _bundle_similarities(HVs:torch.Tensor, selection:torch.Tensor, eps:float=1e-8) -> torch.Tensor:
+    """ 
+    Bundles the per-attribute hypervectors of both populations (indexed [population, attribute, dimension])
+    for each combination of attributes indicated by the rows of the selection matrix and measures their cosine similarity.
+    """
+    bundles = torch.matmul(selection.to(HVs.dtype), HVs) # [population, combination, dimension]
+    dot = (bundles[0] * bundles[1]).sum(dim=-1)
+    magnitude = torch.sqrt((bundles[0] * bundles[0]).sum(dim=-1)) * torch.sqrt((bundles[1] * bundles[1]).sum(dim=-1))
+    return dot / torch.clamp(magnitude, min=eps)
+
+
+def _quadratic_similarities(inner:torch.Tensor, selection:torch.Tensor, eps:float=1e-8) -> torch.Tensor:
+    """ 
+    The cosine similarity of the two populations for each combination of attributes indicated by the rows of the selection matrix, 
+    from the inner products between their per-attribute encodings (indexed [population, population, attribute, attribute]).
+    """
+    # the inner product of two bundles is the sum of the inner products of the bundled attributes
+    inner = (torch.matmul(selection, inner) * selection).sum(dim=-1)
+    magnitude = torch.sqrt(inner[0, 0]) * torch.sqrt(inner[1, 1])
+    return inner[0, 1] / torch.clamp(magnitude, min=eps)
+
+
+def _gray_code_similarities(inner:np.ndarray, attributes:list[str], eps:float=1e-8) -> Iterable[tuple[tuple, float]]:
+    """ 
+    Yields (combination, similarity) for every non-empty combination of the attributes, 
+    from the inner products between the per-attribute encodings of the two populations (indexed [population, population, attribute, attribute]).
+
+    Combinations are visited in Gray code order so that each differs from the previous one by a single attribute;
+    the inner products of the bundles are updated from the previous combination in O(number of attributes) rather than recomputed.
+    """
+    pairs = [(0, 1), (0, 0), (1, 1)] # the cross term and the two squared norms
+    inner = np.stack([inner[p, q] for (p, q) in pairs])
+    symmetric = inner + inner.transpose(0, 2, 1)
+    diagonal = np.stack([np.diag(x) for x in inner])
+    totals = np.zeros(len(pairs)) # inner products of the current bundles
+    linear = np.zeros((len(pairs), len(attributes))) # inner products of each attribute with the current bundles (counted in both directions)
+    included = [False] * len(attributes)
+    for step in range(1, 2**len(attributes)):
+        i = (step & -step).bit_length() - 1 # the attribute that changes
+        if included[i]:
+            linear -= symmetric[:, :, i]
+            totals -= linear[:, i] + diagonal[:, i]
+        else:
+            totals += linear[:, i] + diagonal[:, i]
+            linear += symmetric[:, :, i]
+        included[i] = not included[i]
+        magnitude = np.sqrt(totals[1]) * np.sqrt(totals[2])
+        yield (tuple(att for (att, inc) in zip(attributes, included) if inc), float(totals[0] / max(magnitude, eps)))
+
+
+def _code_dtype(n_labels:int) -> np.dtype:
+    """ The smallest signed integer type that can hold the codes of n_labels distinct values. """
+    for dtype in [np.int8, np.int16, np.int32]:
+        if n_labels <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
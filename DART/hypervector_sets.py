@@ -5,11 +5,17 @@ __all__ = [
 ]
 
 from abc import ABC
+from collections.abc import Iterable
+from collections import OrderedDict
+import hashlib
+import json
+import numpy as np
 import pprint
 import torch
 import torchhd
 
 from .attribute_configuration import *
+from .basis_store import BasisStore
 from .parameters import parameters
 
 class HypervectorSet():
@@ -20,21 +26,66 @@ class HypervectorSet():
     ----------
     config : :class:`BaseConfiguration`
         The config of the attribute from which to construct a set of hypervectors.
+    params : dict, optional
+        The parameters (see :class:`Parameters`) to create the hypervectors with; if None, those of the global parameters when the set is constructed.
     """
-    def __new__(self, config:BaseConfiguration):
+    def __new__(self, config:BaseConfiguration, params:dict=None):
         assert config.type in BaseHypervectorSet.subclasses
-        return BaseHypervectorSet.subclasses[config.type](config)
+        return BaseHypervectorSet.subclasses[config.type](config, params)
 
 
 class BaseHypervectorSet(ABC):
-    """ Used to map between keys and hypervectors. """
+    """ 
+    Used to map between keys and hypervectors. 
+    Under the "BSC" architecture, each hypervector is stored bit-packed into 64-bit words (see :func:`pack_bits`).
+    The parameters are copied when the set is constructed (from params, or else the global parameters), so later changes do not affect it.
+    """
     subclasses = {}
-    def __init__(self):
+    def __init__(self, params:dict=None):
+        self._parameters = {**(parameters if params is None else params)}
         self._hv_kwargs = dict(
-            dimensions=parameters["hypervectors.dimensions"],
-            vsa=parameters["hypervectors.architecture"]
+            dimensions=self._parameters["hypervectors.dimensions"],
+            vsa=self._parameters["hypervectors.architecture"]
         )
+        if self.architecture == "MAP": # the elements of MAP hypervectors are +/-1, which every supported dtype represents exactly
+            self._hv_kwargs["dtype"] = getattr(torch, self._parameters["hypervectors.dtype"])
     
+    def _generator(self, *names) -> torch.Generator|None:
+        """
+        A private generator seeded from parameters["random_state"] combined with the provided names (e.g., the attribute),
+        so that hypervectors do not depend on the global random state or on which other hypervectors were generated before them.
+        If random_state is None, returns None (i.e., torch's global generator is used).
+        """
+        if self._parameters["random_state"] is None:
+            return None
+        digest = hashlib.sha256(json.dumps([self._parameters["random_state"], *names]).encode()).digest()
+        return torch.Generator().manual_seed(int.from_bytes(digest[:8], "little") & (2**63 - 1))
+
+    def _create(self, generate, **description) -> torch.Tensor:
+        """
+        Generates the hypervectors, unless a :class:`BasisStore` is set (parameters["hypervectors.store"]),
+        in which case they are memory mapped from the store (where they are saved when first generated).
+        The hypervectors are stored under the type and keys of the set, the provided description, and the hypervector parameters.
+        """
+        if self.architecture == "BSC":
+            generate = (lambda generate_bits: lambda: pack_bits(generate_bits()))(generate)
+        if self._parameters["hypervectors.store"] is None:
+            return generate()
+        store = BasisStore(self._parameters["hypervectors.store"])
+        description = {"type": self.type, "keys": self.keys, **description, **self._hv_kwargs, "random_state": self._parameters["random_state"]}
+        values = torch.from_numpy(store.get(description, lambda: generate().numpy()))
+        if self.architecture == "BSC":
+            return values
+        return torchhd.ensure_vsa_tensor(values, vsa=self.architecture)
+
+    @property
+    def architecture(self) -> str:
+        return self._hv_kwargs["vsa"]
+
+    @property
+    def dimensions(self) -> int:
+        return self._hv_kwargs["dimensions"]
+
     def __init_subclass__(cls, _type:str):
         cls._type = _type
         super().__init_subclass__()
@@ -71,7 +122,38 @@ class BaseHypervectorSet(ABC):
         return torch.unsqueeze(self.values[idx][:], dim=0)
     
     def get_index(self, key) -> int:
-        return self.keys.index(key)
+        if not hasattr(self, "_key_index"): # keys are fixed once the set is constructed
+            self._key_index = {k:i for (i, k) in enumerate(self.keys)}
+        if key not in self._key_index:
+            raise ValueError(f"{key!r} is not a key of this {self.__class__.__name__}")
+        return self._key_index[key]
+
+    def get_indexes(self, keys_or_codes:Iterable) -> torch.Tensor:
+        """ The indexes of the provided keys; integer codes (including integer arrays/tensors) are already indexes and are returned as is. """
+        if isinstance(keys_or_codes, torch.Tensor) and not keys_or_codes.is_floating_point() and not keys_or_codes.is_complex():
+            return keys_or_codes.to(torch.int64)
+        if isinstance(keys_or_codes, np.ndarray) and keys_or_codes.dtype.kind in "iu":
+            return torch.as_tensor(keys_or_codes, dtype=torch.int64)
+        return torch.tensor([x if isinstance(x, (int, np.integer)) else self.get_index(x) for x in keys_or_codes], dtype=torch.int64)
+
+    def gather(self, keys_or_codes:Iterable) -> torch.Tensor:
+        """ The hypervectors of the provided keys or codes (indexes of the keys), stacked in a single indexing operation. """
+        return self.values[self.get_indexes(keys_or_codes)]
+
+    def counts_to_vector(self, counts:torch.Tensor) -> torch.Tensor:
+        """
+        Bundles the hypervectors directly from the number of times each is bundled (counts, indexed [..., key]), i.e., counts @ values.
+        Integer (e.g., int8) hypervectors are bundled with :func:`bundle_counts`, without converting the whole set.
+        Under BSC, returns the packed majority of the hypervectors (see :func:`majority`).
+        """
+        dtype = counts.dtype if counts.is_floating_point() else torch.float64
+        if self.architecture == "BSC":
+            ones = torch.matmul(counts.to(dtype), unpack_bits(self.values, self.dimensions).to(dtype))
+            return pack_bits(majority(ones, counts.sum(dim=-1)))
+        values = self.values
+        if not values.is_floating_point():
+            return bundle_counts(counts, values)
+        return torch.matmul(counts.to(dtype), values.to(dtype))
     
     def __repr__(self) -> str:
         class_name = self.__class__.__name__
@@ -81,6 +163,8 @@ class BaseHypervectorSet(ABC):
     
     @property
     def similarity(self) -> torch.Tensor: # pairwise similarity of the basis
+        if self.architecture == "BSC":
+            return hamming_similarity(self.values.unsqueeze(1), self.values.unsqueeze(0), self.dimensions)
         sim = torchhd.cosine_similarity(self.values, self.values)
         return sim
 
@@ -88,22 +172,28 @@ class BaseHypervectorSet(ABC):
 class CategoricalHypervectorSet(BaseHypervectorSet, _type="categorical"):
     """
     A set of hypervectors representing a categorical variable (i.e., unique values have no inherent similarity).
+    With a random_state, the hypervector of each value is generated from its own seed, so it does not change when values are added or removed.
 
     Parameters
     ----------
     config : :class:`CategoricalConfiguration`
         The configuration object describing the categorical attribute.
+    params : dict, optional
+        See :class:`HypervectorSet`.
     """
-    def __init__(self, config:CategoricalConfiguration):
-        super().__init__()
+    def __init__(self, config:CategoricalConfiguration, params:dict=None):
+        super().__init__(params)
         self._keys = [*config.groups]
-        self._values = torchhd.random(
-            num_vectors=len(self.keys),
-            **self._hv_kwargs
-        )
+        self._values = self._create(lambda: self._random(config.source), source=config.source)
+
+    def _random(self, source:str) -> torch.Tensor:
+        """ Generates a random hypervector for each key. """
+        if self._parameters["random_state"] is None or len(self.keys) < 1:
+            return torchhd.random(num_vectors=len(self.keys), **self._hv_kwargs)
+        return torch.cat([torchhd.random(num_vectors=1, generator=self._generator(source, key), **self._hv_kwargs) for key in self.keys])
     
     @classmethod
-    def from_values(cls, values): # for the creation of role HVsets
+    def from_values(cls, values, params:dict=None): # for the creation of role HVsets
         """
         Constructs a :class:`CategoricalHypervectorSet` directly from a list of provided values.
 
@@ -111,10 +201,12 @@ class CategoricalHypervectorSet(BaseHypervectorSet, _type="categorical"):
         ----------
         values : Iterable
             The supported unique values of this attribute.
+        params : dict, optional
+            See :class:`HypervectorSet`.
         """
         self = cls.__new__(cls)
         config = CategoricalConfiguration("", values=values)
-        self.__init__(config)
+        self.__init__(config, params)
         return self
 
 
@@ -123,16 +215,149 @@ class NumericHypervectorSet(BaseHypervectorSet, _type="numeric"):
     A set of hypervectors representing a numeric attribute
     (i.e., where the similarity of two values depends on their difference and the defined range (min,max) of the attribute).
 
+    Under MAP the level hypervectors are not materialized. Each level takes every element from one of two endpoint hypervectors, 
+    switching from the first to the second at a random level for each dimension, so only the endpoints and the level at which each 
+    dimension flips are kept (the same hypervectors as torchhd.level). Any level, or the bundle of any counts of the levels, is computed on demand,
+    and the most recently used levels are cached.
+
     Parameters
     ----------
     config : :class:`NumericConfiguration`
         The configuration object desribing the numeric attribute.
+    params : dict, optional
+        See :class:`HypervectorSet`.
     """
-    def __init__(self, config:NumericConfiguration):
-        super().__init__()
+    max_cached_levels = 256
+
+    def __init__(self, config:NumericConfiguration, params:dict=None):
+        super().__init__(params)
         self._keys = [*config.bins]
-        self._values = torchhd.level(
-            num_vectors=len(self.keys),
-            **self._hv_kwargs
-        )
-    
\ No newline at end of file
+        if self.architecture != "MAP":
+            self._values = self._create(lambda: torchhd.level(
+                num_vectors=len(self.keys),
+                generator=self._generator(config.source),
+                **self._hv_kwargs
+            ), source=config.source)
+            return
+        # stored as float32 rows: the two endpoints and the threshold of each dimension
+        endpoints = self._create(lambda: self._endpoints(config.source), source=config.source, layout="endpoints").as_subclass(torch.Tensor)
+        self._start, self._end = endpoints[0].to(self._hv_kwargs["dtype"]), endpoints[1].to(self._hv_kwargs["dtype"])
+        # as in torchhd.level, a dimension takes the first endpoint at each level whose fraction t = 1 - level / (levels - 1) exceeds its threshold
+        t = torch.tensor(1 - np.arange(len(self.keys)) / max(len(self.keys) - 1, 1), dtype=torch.float)
+        self._flips = torch.searchsorted(-t, -endpoints[2], side="left") # the number of levels taking the first endpoint
+        self._levels = OrderedDict()
+
+    def _endpoints(self, source:str) -> torch.Tensor:
+        """ Draws the endpoints and thresholds, consuming the random state exactly as torchhd.level does. """
+        generator = self._generator(source)
+        n_endpoints = 1 if len(self.keys) < 2 else 2
+        endpoints = torchhd.random(num_vectors=n_endpoints, generator=generator, **self._hv_kwargs).to(torch.float)
+        threshold = torch.rand(n_endpoints - 1, self.dimensions, dtype=torch.float, generator=generator)
+        if n_endpoints == 1: # the single level is the first endpoint
+            endpoints, threshold = endpoints.repeat(2, 1), torch.zeros(1, self.dimensions)
+        return torch.cat([endpoints.as_subclass(torch.Tensor), threshold])
+
+    @property
+    def values(self):
+        """ All of the level hypervectors (materialized on every access under MAP). """
+        if hasattr(self, "_values"):
+            return self._values
+        levels = torch.arange(len(self.keys)).unsqueeze(1) < self._flips
+        return torch.where(levels, self._start, self._end).as_subclass(torchhd.MAPTensor)
+
+    def level(self, index:int) -> torch.Tensor:
+        """ The hypervector of the level at the provided index. """
+        if hasattr(self, "_values"):
+            return self._values[index]
+        if index in self._levels:
+            self._levels.move_to_end(index)
+            return self._levels[index]
+        if not -len(self) <= index < len(self):
+            raise IndexError(f"Level {index} is out of range for {len(self)} levels.")
+        level = torch.where(index % len(self) < self._flips, self._start, self._end).as_subclass(torchhd.MAPTensor)
+        self._levels[index] = level
+        if len(self._levels) > self.max_cached_levels:
+            self._levels.popitem(last=False)
+        return level
+
+    def items(self):
+        for i in range(len(self)):
+            yield (self.keys[i], self.level(i))
+
+    def __getitem__(self, key) -> torch.Tensor:
+        return torch.unsqueeze(self.level(self.get_index(key)), dim=0)
+
+    def gather(self, keys_or_codes:Iterable) -> torch.Tensor:
+        if hasattr(self, "_values"):
+            return super().gather(keys_or_codes)
+        indexes = self.get_indexes(keys_or_codes)
+        if ((indexes < -len(self)) | (indexes >= len(self))).any():
+            raise IndexError(f"Level {indexes[(indexes < -len(self)) | (indexes >= len(self))][0].item()} is out of range for {len(self)} levels.")
+        indexes = torch.where(indexes < 0, indexes + len(self), indexes)
+        return torch.where(indexes.unsqueeze(-1) < self._flips, self._start, self._end).as_subclass(torchhd.MAPTensor)
+
+    def counts_to_vector(self, counts:torch.Tensor) -> torch.Tensor:
+        """
+        Bundles the levels weighted by counts (indexed [..., level]), i.e., the equivalent of counts @ values.
+        Under MAP this is computed from the cumulative counts without materializing the levels: 
+        each dimension takes the first endpoint for the samples of the levels below its flip and the second for the rest.
+        Integer (e.g., int8) hypervectors are accumulated in the dtype of counts (float64 if counts are integers), as with :func:`bundle_counts`.
+        """
+        if hasattr(self, "_values"):
+            return super().counts_to_vector(counts)
+        dtype = counts.dtype if counts.is_floating_point() else torch.float64
+        counts = counts.to(dtype)
+        cumulative = torch.nn.functional.pad(torch.cumsum(counts, dim=-1), (1, 0))
+        first = cumulative[..., self._flips]
+        return (self._start.to(dtype) * first + self._end.to(dtype) * (cumulative[..., -1:] - first)).as_subclass(torchhd.MAPTensor)
+    
+
+_POPCOUNT = torch.tensor([bin(byte).count("1") for byte in range(256)], dtype=torch.int64) # number of set bits of each byte
+
+
+def bundle_counts(counts:torch.Tensor|np.ndarray, values:torch.Tensor, dtype:torch.dtype=None) -> torch.Tensor:
+    """
+    counts @ values for integer (e.g., int8) hypervectors (values), converting only the rows with a nonzero count rather than all of them
+    to dtype (by default, that of counts, or float64 if counts are integers). float32 holds the bundles exactly while the counts are integers summing to less than 2**24.
+    """
+    if dtype is None:
+        dtype = counts.dtype if isinstance(counts, torch.Tensor) and counts.is_floating_point() else torch.float64
+    counts = np.asarray(counts, dtype=np.float32 if dtype == torch.float32 else np.float64)
+    rows = values.as_subclass(torch.Tensor).numpy()
+    used = counts.reshape(-1, counts.shape[-1]).any(axis=0)
+    if not used.all(): # gathered in numpy, which takes a fraction of the time of torch's advanced indexing for the few rows of a subgroup
+        used = np.flatnonzero(used)
+        counts, rows = counts[..., used], rows[used]
+    return torch.from_numpy(counts @ rows.astype(counts.dtype)).as_subclass(type(values))
+
+
+def pack_bits(bits:torch.Tensor) -> torch.Tensor:
+    """ Packs binary hypervectors (the last dimension) into 64-bit words, zero padded to a whole number of words. """
+    packed = np.packbits(bits.numpy().astype(bool), axis=-1)
+    packed = np.pad(packed, [(0, 0)] * (packed.ndim - 1) + [(0, -packed.shape[-1] % 8)])
+    return torch.from_numpy(np.ascontiguousarray(packed).view(np.int64))
+
+
+def unpack_bits(words:torch.Tensor, dimensions:int) -> torch.Tensor:
+    """ Unpacks hypervectors packed by :func:`pack_bits` into boolean tensors. """
+    return torch.from_numpy(np.unpackbits(words.numpy().view(np.uint8), axis=-1, count=dimensions).astype(bool))
+
+
+def hamming_similarity(a:torch.Tensor, b:torch.Tensor, dimensions:int) -> torch.Tensor:
+    """
+    The similarity of packed binary hypervectors (broadcast over all but the last dimension) from their Hamming distance, counted by popcount.
+    Scaled as 1 - 2 * distance / dimensions, i.e., the cosine similarity of the equivalent bipolar hypervectors.
+    """
+    distance = _POPCOUNT[torch.bitwise_xor(a, b).contiguous().view(torch.uint8).long()].sum(dim=-1)
+    return 1 - 2 * distance.to(torch.float64) / dimensions
+
+
+def majority(ones:torch.Tensor, totals:torch.Tensor) -> torch.Tensor:
+    """
+    Bundles binary hypervectors by majority from the (weighted) number of bundled hypervectors with each bit set (ones, [..., dimension]) 
+    and the total number bundled (totals, broadcastable to ones without the last dimension).
+    Ties are broken alternately towards 0 and 1 across the dimensions so that neither is favoured.
+    """
+    doubled, totals = 2 * ones, totals.unsqueeze(-1).to(ones.dtype)
+    tie_break = torch.arange(ones.shape[-1]) % 2 == 1
+    return (doubled > totals) | ((doubled == totals) & tie_break)
@@ -4,6 +4,7 @@ __all__ = [
 ]
 
 from collections.abc import MutableMapping
+import os
 import pprint
 
 class Parameters(MutableMapping, dict):
@@ -24,8 +25,13 @@ class Parameters(MutableMapping, dict):
         "hypervectors.dimensions": 10000,
         "hypervectors.architecture": "MAP",
         "random_state": None,
+        "comparison.max_combinations": None,
+        "hypervectors.store": None,
+        "hypervectors.dtype": "float32",
     }
-    supported_architectures = ["MAP"]
+    supported_architectures = ["MAP", "BSC"]
+    # of MAP hypervectors; int8 takes a quarter of the memory of float32, but the rows of each bundle are converted (to float32) as it is encoded, which is slower
+    supported_dtypes = ["float32", "int8"]
 
     def __init__(self, **kwargs):
         """ Initializes a copy with the default parameters and then sets any specified values """
@@ -49,6 +55,14 @@ class Parameters(MutableMapping, dict):
         if key == "random_state":
             if val is not None and not isinstance(val, int):
                 raise Exception(f"random_state must be either an integer or None.")
+        if key == "comparison.max_combinations":
+            if val is not None and (not isinstance(val, int) or val < 1):
+                raise Exception(f"comparison.max_combinations must be either a positive integer or None.")
+        if key == "hypervectors.dtype" and val not in self.supported_dtypes:
+            raise Exception(f"The hypervector dtype \"{val}\" is not supported; must be one of: {self.supported_dtypes}")
+        if key == "hypervectors.store":
+            if val is not None and not isinstance(val, (str, os.PathLike)):
+                raise Exception(f"hypervectors.store must be either the path of a directory or None.")
         # TODO: improve parameter validation
         self._set(key, val)
     
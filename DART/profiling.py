@@ -0,0 +1,97 @@
+from __future__ import annotations
+__all__ = [
+    "CompareStats",
+]
+
+from contextlib import contextmanager
+import pprint
+import time
+
+
+class CompareStats():
+    """
+    Instrumentation of a single :meth:`Dataset.compare` call, collected when it is run with ``profile=True`` (or with a callback)
+    and attached to the returned :class:`Comparison` as :attr:`Comparison.stats`.
+
+    Timers (in seconds) are kept per phase:
+
+    - "index" - resolving the criteria and counting the populations (see :meth:`Dataset.cache_info`)
+    - "prepare" - binding the roles to the basis hypervectors (and, with similarity_mode "gram", their inner products)
+    - "marginals" - deriving the value counts of each subgroup from the populations' counts
+    - "encode" - encoding the populations of each subgroup into per-attribute hypervectors
+    - "bundle" - bundling the combinations of similarity attributes and measuring their similarity
+    - "bookkeeping" - adding the results of each subgroup to the :class:`Comparison`
+    - "total" - the whole call
+
+    With n_jobs != 1, the per-subgroup phases ("marginals", "encode", and "bundle") are summed across workers, so they may exceed "total".
+    """
+    phases = ["index", "prepare", "marginals", "encode", "bundle", "bookkeeping", "total"]
+
+    def __init__(self):
+        self.timers = {phase: 0.0 for phase in self.phases}
+        self.n_subgroups = None # the number of subgroups to visit, once known
+        self.visited = 0 # subgroups visited so far
+        self.empty = 0 # subgroups skipped as either population has no samples in them
+        self.evaluated = 0 # subgroups with at least one similarity value
+        self.similarities = 0 # similarity values measured
+        self.vectors_allocated = 0 # hypervectors created (population encodings and bundles)
+        self.peak_tensor_bytes = 0 # the largest amount of tensor memory held at once by the comparison (shared tensors and those of a single subgroup)
+        self._shared_bytes = 0
+        self._working_bytes = 0
+
+    @contextmanager
+    def time(self, phase:str):
+        """ Adds the time spent within the context to the timer of phase. """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timers[phase] += time.perf_counter() - start
+
+    def allocate(self, n_vectors:int, nbytes:int, shared:bool=False):
+        """
+        Records the allocation of n_vectors hypervectors taking nbytes, either held throughout the comparison (shared) or only for the current subgroup.
+        """
+        self.vectors_allocated += n_vectors
+        if shared:
+            self._shared_bytes += nbytes
+        else:
+            self._working_bytes += nbytes
+        self.peak_tensor_bytes = max(self.peak_tensor_bytes, self._shared_bytes + self._working_bytes)
+
+    def release(self):
+        """ Releases the tensors of the current subgroup. """
+        self._working_bytes = 0
+
+    def record(self, insufficient_samples:bool, similarities:dict):
+        """ Counts a visited subgroup and its results. """
+        self.visited += 1
+        self.empty += insufficient_samples
+        self.evaluated += len(similarities) > 0
+        self.similarities += len(similarities)
+
+    def merge(self, other:CompareStats):
+        """ Adds the per-subgroup timers and allocations of other (i.e., those of a worker process) to these stats. """
+        for phase in ["marginals", "encode", "bundle"]:
+            self.timers[phase] += other.timers[phase]
+        self.vectors_allocated += other.vectors_allocated
+        self.peak_tensor_bytes = max(self.peak_tensor_bytes, self._shared_bytes + other.peak_tensor_bytes)
+
+    @property
+    def progress(self) -> float|None:
+        """ The fraction of subgroups visited so far. """
+        if not self.n_subgroups:
+            return None
+        return self.visited / self.n_subgroups
+
+    def export(self) -> dict:
+        return {
+            "timers": {**self.timers},
+            **{counter: getattr(self, counter) for counter in ["n_subgroups", "visited", "empty", "evaluated", "similarities", "vectors_allocated", "peak_tensor_bytes"]},
+        }
+
+    def __repr__(self) -> str:
+        class_name = self.__class__.__name__
+        indent = len(class_name) + 1
+        repr = ('\n' + ' '*indent).join(pprint.pformat(self.export(), indent=1, width=80 - indent, sort_dicts=False).split("\n"))
+        return f"{class_name}({repr})"
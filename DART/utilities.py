@@ -1,31 +1,140 @@
 from __future__ import annotations
 __all__ = [
     "read_files_to_dataframe",
+    "read_files_in_chunks",
     "isNumeric",
 ]
 
 
-import pandas as pd
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+import os
 from pathlib import Path
 
 
-SUPPORTED_FILETYPES = [".csv", ".tsv"]
+SUPPORTED_FILETYPES = [".csv", ".tsv", ".parquet", ".feather", ".arrow"]
+SUPPORTED_COMPRESSIONS = [".gz", ".bz2", ".zip", ".xz", ".zst"] # supported for .csv and .tsv files
 
-def read_files_to_dataframe(files:list[str|Path]|str|Path, ext:str=None) -> pd.DataFrame: # TODO: improve error handling
+def read_files_to_dataframe(files:list[str|Path]|str|Path,
+                            ext:str=None,
+                            columns:list[str]=None,
+                            filters:dict=None,
+                            n_threads:int=None,
+                            ) -> pd.DataFrame: # TODO: improve error handling
+    """
+    Reads the samples of the provided files into a single dataframe.
+
+    Parameters
+    ----------
+    files : list[str|Path] or str or Path
+        The files to read; supports .csv and .tsv (optionally compressed, e.g., .csv.gz), .parquet, and .feather/.arrow (Arrow IPC) files.
+    ext : str, optional
+        The file extension to read the files as; if None, determined from each file's suffix.
+    columns : list[str], optional
+        Only these columns are read (e.g., the attributes of an :class:`AttributeGroup`). If None, all columns are read.
+    filters : dict, optional
+        Only samples whose value of each column (key) is one of the provided values are kept, e.g., population criteria on the raw values.
+        For .parquet and .feather/.arrow files the filters are applied while reading.
+    n_threads : int, optional
+        The number of files read in parallel; if None, uses up to one thread per CPU.
+    """
+    import pandas as pd # imported here so that importing the utilities (e.g., isNumeric) does not require pandas
+    if not isinstance(files, list):
+        files = [files]
+    if n_threads is None:
+        n_threads = min(len(files), os.cpu_count() or 1)
+    read = lambda file: _read_file(Path(file), ext, columns, filters)
+    if n_threads > 1 and len(files) > 1:
+        with ThreadPoolExecutor(n_threads) as executor:
+            data = [*executor.map(read, files)]
+    else:
+        data = [read(file) for file in files]
+    data = pd.concat(data)
+    return data
+
+def read_files_in_chunks(files:list[str|Path]|str|Path,
+                         chunksize:int=100000,
+                         ext:str=None,
+                         columns:list[str]=None,
+                         filters:dict=None,
+                         ) -> Iterator[pd.DataFrame]:
+    """
+    Reads the samples of the provided files as a sequence of dataframes of at most chunksize samples,
+    so that the files never need to be held in memory all at once.
+    See :func:`read_files_to_dataframe` for the other parameters.
+    """
+    import pandas as pd
     if not isinstance(files, list):
         files = [files]
-    data = []
     for file in files:
         file = Path(file)
-        if ext is None:
-            ext = file.suffix
-        assert ext in SUPPORTED_FILETYPES 
-        if ext in ['.csv', '.tsv']:
-            df = pd.read_csv(file, sep="\t" if ext == ".tsv" else ",")
-        data.append(df)
-    data = pd.concat(data)
+        file_ext = _file_type(file, ext)
+        if file_ext in ['.csv', '.tsv']:
+            for chunk in pd.read_csv(file, sep="\t" if file_ext == ".tsv" else ",", usecols=_filtered_columns(columns, filters), chunksize=chunksize):
+                yield _filter(chunk, filters, columns)
+        else:
+            dataset = _arrow_dataset(file, file_ext)
+            for batch in dataset.to_batches(columns=columns, filter=_arrow_filter(filters), batch_size=chunksize):
+                if batch.num_rows > 0:
+                    yield batch.to_pandas()
+
+def _file_type(file:Path, ext:str=None) -> str:
+    """ Determines (and checks support of) the type of file from its suffix (ignoring any compression suffix), unless ext is provided. """
+    if ext is None:
+        suffixes = file.suffixes
+        if len(suffixes) > 1 and suffixes[-1] in SUPPORTED_COMPRESSIONS:
+            suffixes = suffixes[:-1]
+        ext = suffixes[-1] if len(suffixes) > 0 else ""
+    if ext not in SUPPORTED_FILETYPES:
+        raise Exception(f"Unsupported file type \"{ext}\" ({file}); must be one of: {SUPPORTED_FILETYPES}")
+    return ext
+
+def _read_file(file:Path, ext:str=None, columns:list[str]=None, filters:dict=None) -> pd.DataFrame:
+    """ Reads a single file; see :func:`read_files_to_dataframe`. """
+    import pandas as pd
+    ext = _file_type(file, ext)
+    if ext in ['.csv', '.tsv']:
+        return _filter(pd.read_csv(file, sep="\t" if ext == ".tsv" else ",", usecols=_filtered_columns(columns, filters)), filters, columns)
+    dataset = _arrow_dataset(file, ext)
+    return dataset.to_table(columns=columns, filter=_arrow_filter(filters)).to_pandas()
+
+def _filtered_columns(columns:list[str]=None, filters:dict=None) -> list[str]|None:
+    """ The columns to read so that the filters can be applied after reading: the requested columns and those of the filters. """
+    if columns is None or filters is None:
+        return columns
+    return [*columns, *[column for column in filters if column not in columns]]
+
+def _filter(data:pd.DataFrame, filters:dict=None, columns:list[str]=None) -> pd.DataFrame:
+    """ Keeps only the samples meeting the filters, and then only the requested columns. """
+    if filters is None:
+        return data
+    for column, values in filters.items():
+        values = values if isinstance(values, list) else [values]
+        data = data[data[column].isin(values)]
+    if columns is not None:
+        data = data[[*columns]]
     return data
 
+def _arrow_dataset(file:Path, ext:str):
+    """ Opens a .parquet or .feather/.arrow file as a pyarrow dataset (which supports column projection and filter pushdown). """
+    try:
+        import pyarrow.dataset
+    except ImportError:
+        raise ImportError(f"Reading \"{ext}\" files requires pyarrow; install it with: pip install pyarrow")
+    return pyarrow.dataset.dataset(file, format="parquet" if ext == ".parquet" else "ipc")
+
+def _arrow_filter(filters:dict=None):
+    """ Converts filters to a pyarrow expression. """
+    if filters is None:
+        return None
+    import pyarrow.dataset
+    expression = None
+    for column, values in filters.items():
+        values = values if isinstance(values, list) else [values]
+        condition = pyarrow.dataset.field(column).isin(values)
+        expression = condition if expression is None else expression & condition
+    return expression
+
 def isNumeric(string:str):
     """ Checks if a string represents a number; supports signed values as well as decimals """
-    return string.replace(".","",1).lstrip("-+").isnumeric()
\ No newline at end of file
+    return string.replace(".","",1).lstrip("-+").isnumeric()
@@ -0,0 +1,256 @@
+from __future__ import annotations
+__all__ = [
+    "ResultWriter",
+    "JSONLWriter",
+    "CSVWriter",
+    "ParquetWriter",
+    "open_result_writer",
+]
+
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+import csv
+import io
+import json
+import os
+from pathlib import Path
+import tempfile
+from typing import TYPE_CHECKING
+
+from .comparison import ComparisonItem
+if TYPE_CHECKING: # Dataset is only used for annotations; importing it would import torch
+    from .dataset import Dataset
+
+
+class ResultWriter(ABC):
+    """
+    Incrementally writes the :class:`ComparisonItem` objects of a comparison (e.g., as they are yielded by :meth:`Dataset.compare_iter`) to a file,
+    one row per similarity value with the columns of :meth:`Comparison.to_pandas` (except combination_id, which is specific to a single :class:`Comparison`).
+    The subgroup_id of each row is the position of its subgroup in the sweep.
+
+    Progress is checkpointed every checkpoint_every subgroups (and when the writer is closed) to a "<path>.progress.json" file,
+    along with the last subgroup written and a fingerprint of the sweep (see :meth:`write_sweep`).
+    With resume = True, anything written after the last checkpoint is discarded and writing continues from it, e.g.::
+
+        with CSVWriter("results.csv", resume=True) as writer:
+            writer.write_sweep(dataset, criteria1, criteria2, max_intersectionality_level=-1)
+
+    Parameters
+    ----------
+    path : str or Path
+        The file to write to.
+    resume : bool, default = False
+        Whether to continue from the last checkpoint of a previous writer of the same path (if there is one) rather than starting over.
+    include_empty : bool, default = False
+        If True, subgroups with no similarity values are written as a single row without similarity_from and similarity.
+    checkpoint_every : int, default = 1000
+        The number of subgroups written between checkpoints.
+    """
+    columns = ["subgroup", "similarity_from", "comparison_level", "similarity", "subgroup_id", "insufficient_samples"]
+
+    def __init__(self, path:str|Path, resume:bool=False, include_empty:bool=False, checkpoint_every:int=1000):
+        self._path = Path(path)
+        self._progress_path = self._path.with_name(f"{self._path.name}.progress.json")
+        self._include_empty = include_empty
+        self._checkpoint_every = checkpoint_every
+        checkpoint = None
+        if resume and self._progress_path.exists():
+            checkpoint = json.loads(self._progress_path.read_text())
+        self._n_subgroups = 0 if checkpoint is None else checkpoint["n_subgroups"]
+        self._last_subgroup = None if checkpoint is None else checkpoint.get("last_subgroup")
+        self._sweep = None if checkpoint is None else checkpoint.get("sweep")
+        self._since_checkpoint = 0
+        self._open(checkpoint)
+        self.checkpoint()
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def n_subgroups(self) -> int:
+        """ The number of subgroups written so far (including those of previous writers that were resumed). """
+        return self._n_subgroups
+
+    @property
+    def last_subgroup(self) -> dict|None:
+        """ The last subgroup written (as of the last checkpoint, when resumed). """
+        return self._last_subgroup
+
+    def rows(self, item:ComparisonItem) -> list[dict]:
+        """ The rows written for an item. """
+        rows = item.export("tabular")
+        if len(rows) == 0 and self._include_empty:
+            rows = [{"subgroup": "; ".join([f"{attribute}: {value}" for (attribute, value) in item.subgroup.items()]),
+                     "similarity_from": None, "comparison_level": item.level, "similarity": None}]
+        return [{**row, "subgroup_id": self._n_subgroups, "insufficient_samples": item.insufficient_samples} for row in rows]
+
+    def write(self, item:ComparisonItem):
+        """ Writes the rows of the next subgroup of the sweep. """
+        self._write_rows(self.rows(item))
+        self._last_subgroup = item.subgroup
+        self._n_subgroups += 1
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self._checkpoint_every:
+            self.checkpoint()
+
+    def write_all(self, items:Iterable[ComparisonItem]) -> int:
+        """ Writes every item (in order) and returns the total number of subgroups written. """
+        for item in items:
+            self.write(item)
+        return self._n_subgroups
+
+    def write_sweep(self, dataset:Dataset, criteria1:dict, criteria2:dict, **kwargs) -> int:
+        """
+        Writes the comparison of :meth:`Dataset.compare_iter` with the provided arguments, continuing after the subgroups already written
+        (when resumed) and returning the total number of subgroups written.
+        The sweep (the criteria, the arguments that determine the results, and the dataset's attributes and number of samples) is recorded in the checkpoints;
+        resuming a different sweep, or one whose subgroups are no longer in the same order, raises an Exception rather than mixing their results.
+        """
+        sweep = json.loads(json.dumps({
+            "criteria": [criteria1, criteria2],
+            "arguments": {key: value for (key, value) in kwargs.items() if key not in ["n_jobs", "profile", "callback"]},
+            "attributes": dataset.attributes,
+            "n_samples": dataset.n_samples,
+        }, sort_keys=True, default=str))
+        if self._n_subgroups > 0 and sweep != self._sweep:
+            raise Exception(f"Cannot resume writing to {self._path}: it holds the results of a different sweep ({self._sweep}).")
+        self._sweep = sweep
+        return self.write_all(dataset.compare_iter(criteria1, criteria2, **kwargs, start=self._n_subgroups, after=self._last_subgroup))
+
+    def checkpoint(self):
+        """ Makes everything written so far durable and records it as the point to resume from. """
+        progress = {"n_subgroups": self._n_subgroups, "last_subgroup": self._last_subgroup, "sweep": self._sweep, **self._commit()}
+        with tempfile.NamedTemporaryFile("w", dir=self._progress_path.parent, suffix=".tmp", delete=False) as file:
+            json.dump(progress, file, default=str)
+        os.replace(file.name, self._progress_path)
+        self._since_checkpoint = 0
+
+    def close(self):
+        self.checkpoint()
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @abstractmethod
+    def _open(self, checkpoint:dict|None):
+        """ Opens the output, either anew (checkpoint is None) or continuing from the provided checkpoint. """
+        pass
+
+    @abstractmethod
+    def _write_rows(self, rows:list[dict]):
+        pass
+
+    @abstractmethod
+    def _commit(self) -> dict:
+        """ Flushes the rows written so far and returns the state needed to resume from this point. """
+        pass
+
+    @abstractmethod
+    def _close(self):
+        pass
+
+
+class _TextWriter(ResultWriter):
+    """ A writer of a text file, which is truncated to the length it had at the last checkpoint when resuming. """
+    def _open(self, checkpoint:dict|None):
+        if checkpoint is None:
+            self._file = open(self._path, "wb")
+        else:
+            self._file = open(self._path, "r+b")
+            self._file.truncate(checkpoint["offset"])
+            self._file.seek(checkpoint["offset"])
+        self._text = io.TextIOWrapper(self._file, encoding="utf-8", newline="", write_through=True)
+        if checkpoint is None:
+            self._start()
+
+    def _start(self):
+        """ Writes anything that precedes the rows (e.g., a header). """
+        pass
+
+    def _commit(self) -> dict:
+        self._text.flush()
+        os.fsync(self._file.fileno())
+        return {"offset": self._file.tell()}
+
+    def _close(self):
+        self._text.close()
+
+
+class JSONLWriter(_TextWriter):
+    """ Writes each row as a JSON object on its own line (see :class:`ResultWriter`). """
+    def _write_rows(self, rows:list[dict]):
+        self._text.write("".join([json.dumps(row) + "\n" for row in rows]))
+
+
+class CSVWriter(_TextWriter):
+    """ Writes the rows to a CSV file with a header (see :class:`ResultWriter`); missing values are left empty. """
+    def _start(self):
+        self._writer().writeheader()
+
+    def _writer(self) -> csv.DictWriter:
+        return csv.DictWriter(self._text, fieldnames=self.columns)
+
+    def _write_rows(self, rows:list[dict]):
+        self._writer().writerows(rows)
+
+
+class ParquetWriter(ResultWriter):
+    """
+    Writes the rows to a directory of Parquet files (see :class:`ResultWriter`), which can be read as a single table (e.g., with pd.read_parquet).
+    The rows of each checkpoint interval are buffered and written as a new part file at the checkpoint, as Parquet files cannot be appended to.
+    Requires pyarrow (the "columnar" extra).
+    """
+    def _open(self, checkpoint:dict|None):
+        import pyarrow as pa
+        self._schema = pa.schema([("subgroup", pa.string()), ("similarity_from", pa.string()), ("comparison_level", pa.int32()), ("similarity", pa.float64()),
+                                  ("subgroup_id", pa.int64()), ("insufficient_samples", pa.bool_())])
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._n_parts = 0 if checkpoint is None else checkpoint["parts"]
+        # discard parts that were not recorded by the checkpoint (or all parts, if starting over)
+        for part in self._path.glob("part-*.parquet"):
+            if int(part.stem.split("-")[1]) >= self._n_parts:
+                part.unlink()
+        self._rows = []
+
+    def _write_rows(self, rows:list[dict]):
+        self._rows += rows
+
+    def _commit(self) -> dict:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        if len(self._rows) > 0:
+            table = pa.Table.from_pylist(self._rows, schema=self._schema)
+            with tempfile.NamedTemporaryFile(dir=self._path, suffix=".tmp", delete=False) as file:
+                pq.write_table(table, file)
+            os.replace(file.name, self._path / f"part-{self._n_parts:05d}.parquet")
+            self._n_parts += 1
+            self._rows = []
+        return {"parts": self._n_parts}
+
+    def _close(self):
+        pass
+
+
+def open_result_writer(path:str|Path, ext:str=None, **kwargs) -> ResultWriter:
+    """
+    Opens the :class:`ResultWriter` for the path's format: .jsonl, .csv, or .parquet (a directory of Parquet files).
+
+    Parameters
+    ----------
+    path : str or Path
+        The file (or, for .parquet, directory) to write to.
+    ext : str, optional
+        The format to write; if None, determined from the path's suffix.
+    **kwargs
+        Passed to the writer; see :class:`ResultWriter`.
+    """
+    ext = (ext if ext is not None else Path(path).suffix).lower().lstrip(".")
+    writers = {"jsonl": JSONLWriter, "csv": CSVWriter, "parquet": ParquetWriter}
+    if ext not in writers:
+        raise Exception(f"Unrecognized result format (\"{ext}\"); must be one of: {[*writers]}.")
+    return writers[ext](path, **kwargs)
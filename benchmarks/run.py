@@ -0,0 +1,196 @@
+"""
+Measures the wall time and peak memory of each stage of DART (Dataset construction, index, encode, and compare) on synthetic samples,
+over a grid of dataset and comparison settings. Results can be stored as JSON and compared with those of another revision.
+
+Example (from the root of the repository)::
+
+    python -m benchmarks.run --rows 2000 100000 --levels 0 2 --output results.json
+    python -m benchmarks.run --rows 2000 100000 --levels 0 2 --baseline results.json
+"""
+from __future__ import annotations
+
+import argparse
+import inspect
+from itertools import product
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+from .synthetic import generate_samples
+
+
+def main(args:list[str]=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[2000], help="numbers of samples")
+    parser.add_argument("--categorical", type=int, nargs="+", default=[2], help="numbers of categorical attributes")
+    parser.add_argument("--cardinality", type=int, nargs="+", default=[4], help="numbers of values of each categorical attribute")
+    parser.add_argument("--numeric", type=int, nargs="+", default=[1], help="numbers of numeric attributes")
+    parser.add_argument("--resolution", type=float, nargs="+", default=[1], help="steps between the values of numeric attributes")
+    parser.add_argument("--numeric-bin", choices=["auto", "none"], default="auto", help="bin of the numeric attributes")
+    parser.add_argument("--skew", choices=["single", "double", "none"], default="double")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1], help="max_intersectionality_level of each comparison")
+    parser.add_argument("--comparison-types", nargs="+", default=["default"], choices=["default", "extensive", "overall", "individual"])
+    parser.add_argument("--similarity-modes", nargs="+", default=["hypervector"], choices=["hypervector", "gram"])
+    parser.add_argument("--n-jobs", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="number of times each case is measured (the fastest is kept)")
+    parser.add_argument("--random-state", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to store the results in")
+    parser.add_argument("--baseline", help="JSON file of stored results to compare with")
+    args = parser.parse_args(args)
+
+    results = {"environment": environment(), "import": measure_import(), "cases": []}
+    print(f"import DART: {results['import']['seconds']:.3f} s, import Dataset: {results['import']['dataset_seconds']:.3f} s")
+    # warm up (torch's lazy initialization would otherwise be attributed to the first case)
+    run_case(dict(n_samples=100, random_state=args.random_state), dict(max_intersectionality_level=1), args.random_state)
+    datasets = product(args.rows, args.categorical, args.cardinality, args.numeric, args.resolution)
+    comparisons = [*product(args.levels, args.comparison_types, args.similarity_modes)]
+    for (rows, categorical, cardinality, numeric, resolution) in datasets:
+        dataset_settings = dict(n_samples=rows, n_categorical=categorical, cardinality=cardinality, n_numeric=numeric, numeric_resolution=resolution,
+                                numeric_bin=args.numeric_bin, skew=None if args.skew == "none" else args.skew, random_state=args.random_state)
+        for (level, comparison_type, similarity_mode) in comparisons:
+            compare_settings = dict(max_intersectionality_level=level, comparison_type=comparison_type, similarity_mode=similarity_mode, n_jobs=args.n_jobs)
+            stages = [run_case(dataset_settings, compare_settings, args.random_state) for _ in range(args.repeat)]
+            if stages[0] is None:
+                print(f"skipped (not supported by this revision): {compare_settings}")
+                continue
+            stages = min(stages, key=lambda s: s["compare"]["seconds"])
+            case = {"dataset": dataset_settings, "compare": compare_settings, "stages": stages}
+            results["cases"].append(case)
+            print(describe(case))
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            print_comparison(json.load(file), results)
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=1)
+
+
+# the defaults of the settings of Dataset.compare that older revisions may not accept
+_compare_defaults = {"comparison_type": "default", "similarity_mode": "hypervector", "n_jobs": 1}
+
+
+def compare_arguments(compare, compare_settings:dict) -> dict|None:
+    """
+    The settings that compare accepts (those of older revisions, e.g. to measure a baseline, do not accept every setting),
+    or None if the case cannot be measured as a setting it does not accept differs from its default.
+    """
+    accepted = inspect.signature(compare).parameters
+    if any(value != _compare_defaults.get(name) for (name, value) in compare_settings.items() if name not in accepted):
+        return None
+    return {name: value for (name, value) in compare_settings.items() if name in accepted}
+
+
+def run_case(dataset_settings:dict, compare_settings:dict, random_state:int) -> dict|None:
+    """ Measures each stage of a single case (None if the installed revision of DART does not support its settings). """
+    import DART
+    if (compare_settings := compare_arguments(DART.Dataset.compare, compare_settings)) is None:
+        return None
+    DART.parameters["random_state"] = random_state
+    samples, configurations = generate_samples(**dataset_settings)
+    criteria1, criteria2 = {"Population": "A"}, {"Population": "B"}
+    stages = {}
+    dataset = measure(stages, "init", lambda: DART.Dataset(samples, configurations))
+    indexes = measure(stages, "index", lambda: dataset.index(criteria1))
+    measure(stages, "encode", lambda: dataset.encode(indexes))
+    comparison = measure(stages, "compare", lambda: dataset.compare(criteria1, criteria2, **compare_settings))
+    measure(stages, "export", lambda: comparison.export("tabular"))
+    stages["compare"]["n_results"] = len(comparison.export("tabular"))
+    return stages
+
+
+def measure(stages:dict, stage:str, function):
+    """ Runs function, recording its wall time and the peak increase of the process' resident memory while it ran. """
+    monitor = _MemoryMonitor()
+    start = time.perf_counter()
+    with monitor:
+        result = function()
+    stages[stage] = {"seconds": time.perf_counter() - start, "peak_mb": monitor.peak_mb}
+    return result
+
+
+class _MemoryMonitor():
+    """ Samples the resident memory of the process in a background thread (Linux only; elsewhere the peak is None). """
+    def __init__(self, interval:float=0.001):
+        self._interval = interval
+        self._stop = threading.Event()
+        self.peak_mb = None
+
+    @staticmethod
+    def rss() -> int|None:
+        try:
+            with open("/proc/self/statm") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return None
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self._peak = max(self._peak, self.rss())
+            time.sleep(self._interval)
+
+    def __enter__(self):
+        self._start = self.rss()
+        if self._start is not None:
+            self._peak = self._start
+            self._thread = threading.Thread(target=self._sample, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            self._stop.set()
+            self._thread.join()
+            self._peak = max(self._peak, self.rss())
+            self.peak_mb = (self._peak - self._start) / 2**20
+
+
+def measure_import() -> dict:
+    """ The time taken to import DART and then its Dataset, in a fresh interpreter. """
+    code = "import time; t = time.perf_counter(); import DART; d = time.perf_counter(); DART.Dataset; print(d - t, time.perf_counter() - d)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, cwd=_root()).stdout.split()
+    return {"seconds": float(output[0]), "dataset_seconds": float(output[1])}
+
+
+def environment() -> dict:
+    """ The revision of the repository and the versions of the main dependencies. """
+    import numpy, pandas, torch
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=_root()).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        "revision": revision, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(), "platform": platform.platform(),
+        "cpus": os.cpu_count(), "numpy": numpy.__version__, "pandas": pandas.__version__, "torch": torch.__version__,
+    }
+
+
+def _root() -> str:
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def describe(case:dict) -> str:
+    d, c = case["dataset"], case["compare"]
+    name = f"rows={d['n_samples']} cat={d['n_categorical']}x{d['cardinality']} num={d['n_numeric']}@{d['numeric_resolution']} level={c['max_intersectionality_level']} {c['comparison_type']} {c['similarity_mode']}"
+    stages = "  ".join(f"{stage} {m['seconds']:.3f}s" + ("" if m["peak_mb"] is None else f"/{m['peak_mb']:.0f}MB") for (stage, m) in case["stages"].items())
+    return f"{name}\n    {stages}"
+
+
+def print_comparison(baseline:dict, results:dict):
+    """ Prints the ratio of the time of each stage to that of the same case in the baseline (>1 is slower). """
+    print(f"\nrelative to {baseline['environment']['revision']} (time ratio, >1 is slower):")
+    print(f"    import DART {results['import']['seconds'] / baseline['import']['seconds']:.2f}")
+    cases = {json.dumps([case["dataset"], case["compare"]], sort_keys=True): case for case in baseline["cases"]}
+    for case in results["cases"]:
+        key = json.dumps([case["dataset"], case["compare"]], sort_keys=True)
+        if key not in cases:
+            continue
+        ratios = "  ".join(f"{stage} {m['seconds'] / max(cases[key]['stages'][stage]['seconds'], 1e-9):.2f}" for (stage, m) in case["stages"].items() if stage in cases[key]["stages"])
+        print(describe(case).split("\n")[0] + "\n    " + ratios)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Synthetic sample metadata for benchmarking, mirroring the skew patterns of simulated_datasets/single_population_skew.csv and double_population_skew.csv.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from typing import Literal
+
+from DART import AttributeGroup, CategoricalConfiguration, NumericConfiguration
+
+
+def generate_samples(n_samples:int=2000,
+                     n_categorical:int=2,
+                     cardinality:int=4,
+                     n_numeric:int=1,
+                     numeric_resolution:float=1,
+                     numeric_bin:Literal["auto", "none"]="auto",
+                     skew:Literal["single", "double"]|None="double",
+                     skew_probability:float=0.6,
+                     random_state:int=None,
+                     ) -> tuple[pd.DataFrame, AttributeGroup]:
+    """
+    Generates the samples of two equally sized populations ("Population" A and B) and the configurations of their attributes.
+    Every attribute is uniformly distributed within each population, except that the samples of one population with the last value
+    of the first categorical attribute take the first value of the second categorical attribute with skew_probability (as manufacturer "iii"
+    and disease status "positive" in population A of the simulated datasets), so that populations only differ within intersectional subgroups.
+
+    Parameters
+    ----------
+    n_samples : int, default = 2000
+        The total number of samples (split equally between the populations).
+    n_categorical : int, default = 2
+        The number of categorical attributes (besides "Population"), named "cat_0", "cat_1", ...
+    cardinality : int, default = 4
+        The number of values of each categorical attribute ("v0", "v1", ...).
+    n_numeric : int, default = 1
+        The number of numeric attributes, named "num_0", "num_1", ..., with values in [0, 100].
+    numeric_resolution : float, default = 1
+        The step between the values of the numeric attributes.
+    numeric_bin : {"auto", "none"}, default = "auto"
+        The bin of the numeric attributes' configurations; with "none" each distinct value (100 / numeric_resolution + 1 of them) is its own level.
+    skew : {"single", "double"} or None, default = "double"
+        "single" - only population A is skewed (as single_population_skew.csv)
+        "double" - population B is also skewed, towards the second value of the second categorical attribute (as double_population_skew.csv)
+        None - neither population is skewed
+    skew_probability : float, default = 0.6
+        The probability with which the samples of a skewed subgroup take the value they are skewed towards.
+    random_state : int, optional
+        Seed of the generator.
+    """
+    rng = np.random.default_rng(random_state)
+    values = [f"v{i}" for i in range(cardinality)]
+    samples = {"Population": np.repeat(["A", "B"], [n_samples - n_samples // 2, n_samples // 2])}
+    for i in range(n_categorical):
+        samples[f"cat_{i}"] = rng.choice(values, n_samples)
+    if n_categorical >= 2 and skew is not None:
+        for (population, target) in [("A", values[0]), ("B", values[min(1, cardinality - 1)])][:1 if skew == "single" else 2]:
+            subgroup = (samples["Population"] == population) & (samples["cat_0"] == values[-1])
+            skewed = subgroup & (rng.random(n_samples) < skew_probability)
+            samples["cat_1"] = np.where(skewed, target, samples["cat_1"])
+    n_steps = int(round(100 / numeric_resolution))
+    for i in range(n_numeric):
+        samples[f"num_{i}"] = np.round(rng.integers(0, n_steps + 1, n_samples) * numeric_resolution, 10)
+    samples = pd.DataFrame(samples)
+    configurations = AttributeGroup([
+        CategoricalConfiguration("Population", values=["A", "B"]),
+        *[CategoricalConfiguration(f"cat_{i}", values=values) for i in range(n_categorical)],
+        *[NumericConfiguration(f"num_{i}", min=0, max=100, step=numeric_resolution, bin=numeric_bin) for i in range(n_numeric)],
+    ])
+    return samples, configurations
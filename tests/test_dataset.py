@@ -0,0 +1,68 @@
+"""
+Tests of :class:`DART.Dataset` on a small dataset. Run from the root of the repository::
+
+    python -m pytest tests
+"""
+import os
+
+import pandas as pd
+import pytest
+
+import DART
+
+
+@pytest.fixture
+def dataset() -> DART.Dataset:
+    DART.parameters["random_state"] = 0
+    samples = pd.DataFrame({
+        "Population": ["A", "A", "B", "B", "B"],
+        "Sex": ["f", "m", "f", "f", "m"],
+    }, index=[10, 11, 12, 13, 14])
+    return DART.Dataset(samples)
+
+
+def test_counts(dataset):
+    counts = dataset.counts([10, 12, 13])
+    assert counts["Population"].sum().item() == 3
+    assert counts["Sex"].sum().item() == 3
+
+
+def test_counts_of_unknown_index(dataset):
+    with pytest.raises(KeyError, match="99999"):
+        dataset.counts([10, 99999])
+
+
+def test_repeated_appends(dataset):
+    for index in range(20, 30):
+        dataset.append(pd.DataFrame({"Population": ["B"], "Sex": ["m"]}, index=[index]))
+    dataset.append(pd.DataFrame({"Population": ["A", "A"], "Sex": ["f", "f"]}), weights=[2, 3], ignore_index=True)
+    assert dataset.codes.index.tolist() == [10, 11, 12, 13, 14, *range(20, 32)]
+    assert dataset.n_samples == 20
+    assert dataset.counts([20, 29, 31])["Population"].tolist() == [[3, 2]]
+    assert dataset.index({"Population": "A", "Sex": "f"}) == [10, 30, 31]
+    dataset.remove([25, 30])
+    assert dataset.value_counts["Population"].tolist() == [5, 12]
+
+
+@pytest.mark.parametrize("index", [[14, 15], [15, 15]])
+def test_append_rejects_duplicate_indexes(dataset, index):
+    with pytest.raises(Exception, match="indexes"):
+        dataset.append(pd.DataFrame({"Population": ["A", "B"], "Sex": ["f", "m"]}, index=index))
+    assert dataset.n_samples == 5
+
+
+@pytest.mark.parametrize("n_jobs", [0, -2, 1.5, True])
+def test_compare_rejects_invalid_n_jobs(dataset, n_jobs):
+    with pytest.raises(ValueError, match="n_jobs"):
+        dataset.compare({"Population": "A"}, {"Population": "B"}, n_jobs=n_jobs)
+
+
+def test_int8_compare_matches_float32(monkeypatch):
+    samples = pd.read_csv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "simulated_datasets", "double_population_skew.csv"))
+    similarities = {}
+    for dtype in ["float32", "int8"]:
+        monkeypatch.setitem(DART.parameters, "random_state", 0)
+        monkeypatch.setitem(DART.parameters, "hypervectors.dtype", dtype)
+        comparison = DART.Dataset(samples).compare({"Population": "A"}, {"Population": "B"}, max_intersectionality_level=1)
+        similarities[dtype] = comparison.to_pandas()["similarity"].tolist()
+    assert similarities["int8"] == similarities["float32"]
@@ -0,0 +1,39 @@
+"""
+Importing DART and using its lightweight names (configurations and comparisons) must not import torch, torchhd, numpy, or pandas,
+and must stay within a budget of IMPORT_BUDGET seconds (importing torch alone takes seconds). Run from the root of the repository::
+
+    python -m pytest tests
+"""
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_BUDGET = 0.1 # seconds; about 0.02 s is typical
+
+_code = """
+import json, sys, time
+start = time.perf_counter()
+import DART
+DART.AttributeGroup
+DART.Comparison
+print(json.dumps({"seconds": time.perf_counter() - start, "modules": [*sys.modules]}))
+"""
+
+
+def _import_dart() -> dict:
+    """ Imports DART in a fresh interpreter, returning the time taken and the modules loaded by then. """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", _code], capture_output=True, text=True, check=True, cwd=root).stdout
+    return json.loads(output)
+
+
+def test_import_does_not_load_heavy_dependencies():
+    modules = _import_dart()["modules"]
+    for module in ["torch", "torchhd", "numpy", "pandas"]:
+        assert module not in modules, f"importing DART imported {module}"
+
+
+def test_import_time():
+    seconds = min(_import_dart()["seconds"] for _ in range(3)) # the fastest of a few runs, to discount noise
+    assert seconds < IMPORT_BUDGET, f"importing DART took {seconds:.3f} s (budget: {IMPORT_BUDGET} s)"